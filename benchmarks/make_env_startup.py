@@ -0,0 +1,37 @@
+"""Measures the time to find the simulator of an env id and make its env, in a fresh interpreter.
+
+Usage: python benchmarks/make_env_startup.py [env_id ...]
+"""
+
+import subprocess
+import sys
+
+SNIPPET = """
+import sys
+import time
+
+start = time.perf_counter()
+from milo.env import find_simulator, make_env
+imported = time.perf_counter()
+simulator = find_simulator({env_id!r})
+found = time.perf_counter()
+env = make_env({env_id!r}, num_envs=1, vectorization_mode="sync")
+made = time.perf_counter()
+env.close()
+
+heavy = [name for name in ("mujoco", "dm_control", "metaworld") if name in sys.modules]
+print(
+    f"{{{env_id!r}:<28}} {{simulator:<10}} import {{imported - start:6.3f}}s  find {{found - imported:6.3f}}s  "
+    f"make {{made - found:6.3f}}s  heavy imports: {{', '.join(heavy) or 'none'}}"
+)
+"""
+
+
+def main(env_ids: list[str]) -> None:
+    """Prints the startup times of each env id, each measured in its own interpreter."""
+    for env_id in env_ids:
+        subprocess.run([sys.executable, "-c", SNIPPET.format(env_id=env_id)], check=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["CartPole-v1", "walker-walk", "button-press-topdown-v2"])
@@ -1,31 +1,133 @@
+from typing import Any
+
 import numpy as np
 import torch
 
 
+class TensorConverter:
+    """Converts numpy arrays to torch tensors on a device, reusing the tensors of previous calls.
+
+    On CPU the tensors share the memory of the arrays. On other devices, each key keeps its
+    device tensor (and, with `pin_memory`, a pinned host staging tensor allowing `non_blocking`
+    copies) across calls, so the tensors returned for a key are overwritten by the next call.
+    Pinning falls back to pageable memory when CUDA is not available.
+    """
+
+    def __init__(
+        self,
+        device: str | torch.device = "cpu",
+        pin_memory: bool = False,
+        non_blocking: bool = False,
+    ) -> None:
+        self.device = torch.device(device)
+        self.pin_memory = pin_memory and self.device.type == "cuda" and torch.cuda.is_available()
+        self.non_blocking = non_blocking and self.pin_memory
+
+        self._tensors: dict[str, torch.Tensor] = {}
+        self._staging: dict[str, torch.Tensor] = {}
+        self._copy_done: dict[str, torch.cuda.Event] = {}
+
+    def _reusable(self, tensors: dict[str, torch.Tensor], key: str, like: torch.Tensor, **kwargs: Any) -> torch.Tensor:
+        tensor = tensors.get(key)
+        if tensor is None or tensor.shape != like.shape or tensor.dtype != like.dtype:
+            tensor = torch.empty(like.shape, dtype=like.dtype, **kwargs)
+            tensors[key] = tensor
+        return tensor
+
+    def __call__(self, key: str, array: np.ndarray) -> torch.Tensor:
+        host = torch.from_numpy(array)
+        if self.device.type == "cpu":
+            return host
+
+        tensor = self._reusable(self._tensors, key, host, device=self.device)
+        if self.pin_memory:
+            # wait for the previous copy out of the staging tensor before overwriting it
+            if key in self._copy_done:
+                self._copy_done[key].synchronize()
+            staging = self._reusable(self._staging, key, host, pin_memory=True)
+            staging.copy_(host)
+            tensor.copy_(staging, non_blocking=self.non_blocking)
+            if self.non_blocking:
+                self._copy_done[key] = torch.cuda.Event()
+                self._copy_done[key].record()
+        else:
+            tensor.copy_(host)
+        return tensor
+
+
+# fields read as None when a batch does not hold them
+BATCH_FIELDS = (
+    "obs",
+    "action",
+    "reward",
+    "next_obs",
+    "done",
+    "terminated",
+    "truncated",
+    "info",
+    "pixels",
+    "env_id",
+    "indices",
+    "weights",
+    "discount",
+)
+
+
 class Batch:
-    obs: np.ndarray | None = None
-    action: np.ndarray | None = None
-    reward: np.ndarray | None = None
-    next_obs: np.ndarray | None = None
-    done: np.ndarray | None = None
-    terminated: np.ndarray | None = None
-    truncated: np.ndarray | None = None
-    info: np.ndarray | None = None
-    pixels: np.ndarray | None = None
-
-    def __init__(self, batch: list) -> None:
+    """Fields of a batch of rows, built from a list of transitions or a dict of arrays.
+
+    With a `schema` (see `ReplayBuffer.schema`), the fields must be listed in the schema.
+    """
+
+    obs: np.ndarray | None
+    action: np.ndarray | None
+    reward: np.ndarray | None
+    next_obs: np.ndarray | None
+    done: np.ndarray | None
+    terminated: np.ndarray | None
+    truncated: np.ndarray | None
+    info: np.ndarray | None
+    pixels: np.ndarray | None
+    env_id: np.ndarray | None
+    indices: np.ndarray | None
+    weights: np.ndarray | None
+    discount: np.ndarray | None
+
+    def __init__(
+        self,
+        batch: list | dict[str, np.ndarray],
+        schema: dict[str, dict] | None = None,
+        size: int | None = None,
+    ) -> None:
         self._batch = batch
+        self.schema = schema
+        if isinstance(batch, dict) and schema is not None and not batch.keys() <= schema.keys():
+            raise ValueError(f"Fields {sorted(batch.keys() - schema.keys())} are not in the batch schema.")
+
+        batch_dict = self.batchify(set_attr=True)
+        self._keys = list(batch_dict)
+        self._size = len(batch) if isinstance(batch, list) else size
+
+    def __getattr__(self, key: str) -> Any:
+        # only called for the fields the batch does not hold
+        if key in BATCH_FIELDS:
+            return None
+        raise AttributeError(f"'Batch' object has no attribute '{key}'")
 
-        self.batchify(set_attr=True)
+    def keys(self) -> list[str]:
+        """Returns the fields of the batch."""
+        return list(self._keys)
 
     def batchify(self, set_attr: bool = False) -> dict:
-        keys = list(self._batch[0].__dict__.keys())
+        # already stacked arrays (e.g. gathered by index from a buffer) are used as is
+        if isinstance(self._batch, dict):
+            if set_attr:
+                for key, value in self._batch.items():
+                    setattr(self, key, value)
+            return {key: getattr(self, key) for key in self._batch}
 
-        # Check if all transitions have the same attributes
-        for transition in self._batch[1:]:
-            assert set(transition.__dict__.keys()) == set(
-                keys,
-            ), "All transitions in the batch must have the same attributes."
+        # the transitions share the fields set in the first one
+        keys = [key for key in self._batch[0].__slots__ if getattr(self._batch[0], key) is not None]
 
         # Stack the attributes of the transitions in numpy arrays
         batch_dict = {key: np.stack([getattr(transition, key) for transition in self._batch]) for key in keys}
@@ -37,33 +139,36 @@ class Batch:
 
         return batch_dict
 
-    def to_torch(self, device: str = "cpu", exclude_keys: list | None = None) -> None:
+    def to_torch(
+        self,
+        device: str = "cpu",
+        exclude_keys: list | None = None,
+        converter: TensorConverter | None = None,
+    ) -> None:
+        """Converts the arrays to tensors, with `converter` to reuse tensors and staging buffers across batches."""
         exclude_keys = exclude_keys or ["info"]
+        converter = converter or TensorConverter(device)
 
-        for key in self.__dict__:
+        for key in self._keys:
             if isinstance(self.__dict__[key], np.ndarray) and key not in exclude_keys:
-                self.__dict__[key] = torch.from_numpy(self.__dict__[key]).to(device)
+                self.__dict__[key] = converter(key, self.__dict__[key])
 
     def to_numpy(self) -> None:
-        for key in self.__dict__:
+        for key in self._keys:
             if isinstance(self.__dict__[key], torch.Tensor):
-                self.__dict__[key] = self.__dict__[key].cpu().numpy()
+                # CPU tensors are viewed as arrays without copy
+                self.__dict__[key] = self.__dict__[key].detach().cpu().numpy()
 
     def __len__(self) -> int:
-        return len(self._batch)
+        if self._size is None:
+            self._size = len(getattr(self, self._keys[0])) if self._keys else 0
+        return self._size
 
     def __repr__(self) -> str:
+        def describe(key: str) -> Any:
+            value = getattr(self, key)
+            return value if value is None else value.shape
 
-        return (
-            "Batch(\n"
-            f"\tobs = {self.obs if self.obs is None else self.obs.shape},\n"
-            f"\taction = {self.action if self.action is None else self.action.shape},\n"
-            f"\treward = {self.reward if self.reward is None else self.reward.shape},\n"
-            f"\tnext_obs = {self.next_obs if self.next_obs is None else self.next_obs.shape},\n"
-            f"\tdone = {self.done if self.done is None else self.done.shape},\n"
-            f"\tterminated = {self.terminated if self.terminated is None else self.terminated.shape},\n"
-            f"\ttruncated = {self.truncated if self.truncated is None else self.truncated.shape},\n"
-            f"\tinfo = {self.info if self.info is None else self.info.shape},\n"
-            f"\tpixels = {self.pixels if self.pixels is None else self.pixels.shape},\n"
-            ")"
-        )
+        keys = [*BATCH_FIELDS, *(key for key in self._keys if key not in BATCH_FIELDS)]
+        fields = "".join(f"\t{key} = {describe(key)},\n" for key in keys)
+        return f"Batch(\n{fields})"
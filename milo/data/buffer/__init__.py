@@ -0,0 +1,4 @@
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.buffer.prioritized import PrioritizedReplayBuffer
+
+__all__ = ["ReplayBuffer", "PrioritizedReplayBuffer"]
@@ -1,32 +1,382 @@
-import random
+from typing import Any
+
+import numpy as np
+from gymnasium.spaces import Space
 
 from milo.data.batch import Batch
+from milo.data.buffer.pixels import NextFrameView, PixelStorage, is_image_shape
 from milo.data.transition import Transition
 
+FIELDS = ("obs", "action", "reward", "next_obs", "done", "terminated", "truncated", "info", "pixels")
+
+
+def _split_info(info: dict, num_envs: int) -> list[dict]:
+    """Splits a vectorized info dict (values with their `_key` masks) into one info dict per env."""
+    infos: list[dict] = [{} for _ in range(num_envs)]
+    for key, value in info.items():
+        if key.startswith("_"):
+            continue
+        mask = info.get(f"_{key}", np.ones(num_envs, dtype=np.bool_))
+        per_env = _split_info(value, num_envs) if isinstance(value, dict) else value
+        for env_id in np.flatnonzero(mask):
+            infos[env_id][key] = per_env[env_id]
+    return infos
+
 
 class ReplayBuffer:
-    def __init__(self, capacity: int) -> None:
-        self.capacity = capacity
-        self.buffer: list = []
+    """Ring buffer storing each field in one preallocated array laid out as `(env, time, ...)`.
+
+    Without `num_envs`, every pushed transition is a single row. With `num_envs`, pushed
+    transitions are vector steps whose leading axis is split into one row per env, so that a
+    sampled row is always a single env step whatever the number of envs.
+
+    With `pixel_storage_kwargs`, rendered frames and image observations are kept in a
+    `PixelStorage` built with these arguments, and next observations are rebuilt from the
+    observations instead of being stored a second time.
+
+    The info pushed as dicts is stored as one dict per row, and the info pushed as structured
+    arrays (see `extract_info`) in a typed array.
+    """
+
+    # fields dropped on push, for storage backends that cannot hold them
+    _unstored_fields: tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_space: Space | None = None,
+        action_space: Space | None = None,
+        num_envs: int | None = None,
+        pixel_storage_kwargs: dict[str, Any] | None = None,
+        seed: int | None = None,
+    ) -> None:
+        if num_envs is not None and not 0 < num_envs <= capacity:
+            raise ValueError(f"num_envs must be in [1, capacity], but got {num_envs=} and {capacity=}.")
+
+        self.num_envs = num_envs or 1
+        self.flatten = num_envs is not None
+        # each env gets an equal share of the rows
+        self.env_capacity = capacity // self.num_envs
+        self.capacity = self.env_capacity * self.num_envs
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.pixel_storage_kwargs = pixel_storage_kwargs
+
+        self._data: dict[str, Any] = {}
+        self._index = np.zeros(self.num_envs, dtype=np.int64)
+        self._size = np.zeros(self.num_envs, dtype=np.int64)
+        self._rng = np.random.default_rng(seed)
+        # output arrays reused across calls to sample, keyed by batch size
+        self._sample_out: dict[int, dict[str, np.ndarray]] = {}
+        # fields of the sampled batches, set once all the fields are allocated
+        self._schema: dict[str, dict] | None = None
+
+        # preallocate the fields whose layout is known from the spaces
+        if observation_space is not None and observation_space.shape is not None:
+            if pixel_storage_kwargs is not None and is_image_shape(observation_space.shape, observation_space.dtype):
+                storage = self._pixel_storage(observation_space.shape)
+                self._data["obs"], self._data["next_obs"] = storage, NextFrameView(storage)
+            else:
+                self._allocate("obs", observation_space.shape, observation_space.dtype)
+                self._allocate("next_obs", observation_space.shape, observation_space.dtype)
+        if action_space is not None and action_space.shape is not None:
+            self._allocate("action", action_space.shape, action_space.dtype)
+
         self.reset()
 
+    def _allocate(self, key: str, shape: tuple, dtype: np.dtype | type | None) -> None:
+        """Allocates a contiguous array holding `env_capacity` rows per env of the given field."""
+        self._data[key] = np.zeros((self.num_envs, self.env_capacity, *shape), dtype=dtype)
+
+    def _pixel_storage(self, frame_shape: tuple) -> PixelStorage:
+        return PixelStorage(self.num_envs, self.env_capacity, frame_shape, **(self.pixel_storage_kwargs or {}))
+
+    def _allocate_like(self, key: str, value: np.ndarray) -> None:
+        """Allocates the array of a field from the first (per-env) value pushed for it."""
+        if key == "info" and value.dtype == object:
+            self._data[key] = np.empty((self.num_envs, self.env_capacity), dtype=object)
+        elif key == "pixels" and self.pixel_storage_kwargs is not None:
+            self._data[key] = self._pixel_storage(value.shape[1:])
+        else:
+            self._allocate(key, value.shape[1:], value.dtype)
+
+    def _as_rows(self, key: str, value: Any, num_rows: int) -> np.ndarray:
+        """Converts a pushed value into an array whose leading axis has one entry per written row."""
+        if key == "info" and not isinstance(value, np.ndarray):
+            rows = np.empty(num_rows, dtype=object)
+            if self.flatten:
+                rows[:] = _split_info(value or {}, num_rows)
+            else:
+                rows[0] = value
+            return rows
+        value = np.asarray(value)
+        return value if self.flatten else value[None]
+
     def reset(self) -> None:
-        self.buffer = []
+        # the arrays are kept allocated, only the cursors are moved back
+        self._index[:] = 0
+        self._size[:] = 0
+        for value in self._data.values():
+            if isinstance(value, PixelStorage):
+                value.reset()
+
+    def push(self, transition: Transition, env_ids: np.ndarray | None = None) -> None:
+        """Writes a transition in place, one row per env listed in `env_ids` (all envs by default)."""
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+        time_ids = self._index[env_ids]
+
+        for key in FIELDS:
+            if key in self._unstored_fields:
+                continue
+            value = getattr(transition, key)
+            if value is None and key not in self._data:
+                continue
+            # a missing info is stored as an empty dict next to the info dicts of other transitions
+            if value is None and key != "info":
+                raise ValueError(f"Transition is missing the field '{key}' stored in the buffer.")
+            rows = self._as_rows(key, value, len(env_ids))
+            if key not in self._data:
+                self._allocate_like(key, rows)
+            self._data[key][env_ids, time_ids] = rows
+
+        # overwrite the oldest rows of each env once it is full
+        self._index[env_ids] = (time_ids + 1) % self.env_capacity
+        self._size[env_ids] = np.minimum(self._size[env_ids] + 1, self.env_capacity)
+
+    def _ordered_time_ids(self, env_id: int) -> np.ndarray:
+        """Returns the positions of the rows of an env, from the oldest to the newest."""
+        size = self._size[env_id]
+        start = self._index[env_id] if size == self.env_capacity else 0
+        return (start + np.arange(size)) % self.env_capacity
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """Maps the position of a row in (env, insertion) order to its (env, time) position in the arrays."""
+        length = len(self)
+        if not -length <= index < length:
+            raise IndexError(f"Index {index} out of range for buffer of length {length}.")
+        index %= length
+        env_id = int(np.searchsorted(np.cumsum(self._size), index, side="right"))
+        index -= int(self._size[:env_id].sum())
+        return env_id, int(self._ordered_time_ids(env_id)[index])
+
+    def __getitem__(self, index: int) -> Transition:
+        env_id, time_id = self._locate(index)
+        return Transition(**{key: value[env_id, time_id] for key, value in self._data.items()})
+
+    @property
+    def schema(self) -> dict[str, dict]:
+        """Returns the shape and dtype of a row of each field of the sampled batches."""
+        # fields are allocated on their first push, possibly through a shallow copy sharing `_data`
+        if self._schema is None or not self._data.keys() <= self._schema.keys():
+            self._schema = {
+                key: {"shape": list(value.shape[2:]), "dtype": np.lib.format.dtype_to_descr(np.dtype(value.dtype))}
+                for key, value in self._data.items()
+            }
+            if self.flatten:
+                self._schema["env_id"] = {"shape": [], "dtype": np.dtype(np.int64).str}
+        return self._schema
 
-    def push(self, transition: Transition) -> None:
-        if len(self.buffer) >= self.capacity:
-            self.buffer.pop(0)  # Remove the first element
-        self.buffer.append(transition)
+    def _select_keys(self, keys: list[str] | None) -> list[str]:
+        """Returns the fields to sample, checked against the schema, all the fields by default."""
+        if keys is None:
+            return list(self.schema)
+        unknown = set(keys) - self.schema.keys()
+        if unknown:
+            raise ValueError(f"Fields {sorted(unknown)} are not in the buffer, which stores {sorted(self.schema)}.")
+        return list(keys)
 
-    def sample(self, batch_size: int) -> Batch:
-        batch = random.sample(self.buffer, batch_size)
+    def _gather_field(
+        self,
+        key: str,
+        env_ids: np.ndarray,
+        time_ids: np.ndarray,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Gathers the rows at the given (env, time) positions of a field, optionally into `out`."""
+        value = self._data[key]
+        if isinstance(value, np.ndarray):
+            flat_ids = env_ids * self.env_capacity + time_ids
+            return np.take(value.reshape(-1, *value.shape[2:]), flat_ids, axis=0, out=out)
+        if out is None:
+            return value[env_ids, time_ids]
+        out[...] = value[env_ids, time_ids]
+        return out
+
+    def _gather(
+        self,
+        env_ids: np.ndarray,
+        time_ids: np.ndarray,
+        out: dict[str, np.ndarray] | None = None,
+        keys: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Gathers the rows at the given (env, time) positions of the `keys` fields (all by default), optionally into `out`."""
+        batch: dict[str, Any] = {}
+        for key in self._data if keys is None else keys:
+            if key not in self._data:
+                continue
+            batch[key] = self._gather_field(key, env_ids, time_ids, None if out is None else out[key])
+        if self.flatten and (keys is None or "env_id" in keys):
+            batch["env_id"] = env_ids
+        return batch
+
+    def _get_sample_out(self, batch_size: int) -> dict[str, np.ndarray]:
+        out = self._sample_out.setdefault(batch_size, {})
+        # the fields allocated since the last call get their arrays too
+        for key, value in self._data.items():
+            if key not in out:
+                out[key] = np.empty((batch_size, *value.shape[2:]), dtype=value.dtype)
+        return out
+
+    def _sample_ids(self, batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+        """Draws (env, time) positions uniformly over all the stored rows."""
+        sizes = np.cumsum(self._size)
+        rows = self._rng.integers(0, sizes[-1], size=batch_size)
+        env_ids = np.searchsorted(sizes, rows, side="right")
+        time_ids = rows - (sizes[env_ids] - self._size[env_ids])
+        return env_ids, time_ids
+
+    def sample(self, batch_size: int, reuse_memory: bool = False, keys: list[str] | None = None) -> Batch:
+        """Samples `batch_size` rows uniformly with replacement.
+
+        With `reuse_memory`, the rows are gathered into arrays owned by the buffer, which are
+        overwritten by the next call to `sample` with the same batch size.
+
+        Only the fields listed in `keys` (all the fields by default) are gathered.
+        """
+        if len(self) == 0:
+            raise ValueError("Cannot sample from an empty buffer.")
+        keys = self._select_keys(keys)
+        env_ids, time_ids = self._sample_ids(batch_size)
+        out = self._get_sample_out(batch_size) if reuse_memory else None
+        return Batch(self._gather(env_ids, time_ids, out, keys=keys), schema=self.schema, size=batch_size)
+
+    def sample_sequences(self, batch_size: int, length: int, max_rejections: int = 8) -> Batch:
+        """Samples `batch_size` windows of `length` consecutive rows of an env, with fields shaped `(batch_size, length, ...)`.
+
+        The windows never cross the end of an episode, which may only be their last row. Windows
+        are drawn uniformly and the invalid ones redrawn up to `max_rejections` times, after which
+        the remaining ones are drawn among all the valid windows.
+        """
+        if length < 1:
+            raise ValueError(f"length must be positive, but got {length=}.")
+        num_starts = np.maximum(self._size - length + 1, 0)
+        if num_starts.sum() == 0:
+            raise ValueError(f"No env holds {length} rows to sample sequences from.")
+
+        env_ids, starts = self._sample_window_starts(batch_size, num_starts)
+        offsets = np.arange(length)
+        for _ in range(max_rejections):
+            invalid = np.flatnonzero(self._crosses_episode_end(env_ids, starts, offsets))
+            if len(invalid) == 0:
+                break
+            env_ids[invalid], starts[invalid] = self._sample_window_starts(len(invalid), num_starts)
+        else:
+            invalid = np.flatnonzero(self._crosses_episode_end(env_ids, starts, offsets))
+            if len(invalid) > 0:
+                env_ids[invalid], starts[invalid] = self._sample_valid_window_starts(len(invalid), length)
+
+        time_ids = (starts[:, None] + offsets) % self.env_capacity
+        env_ids = np.broadcast_to(env_ids[:, None], time_ids.shape)
+        batch = self._gather(env_ids.ravel(), time_ids.ravel())
+        return Batch({key: value.reshape(batch_size, length, *value.shape[1:]) for key, value in batch.items()})
+
+    def _sample_window_starts(self, batch_size: int, num_starts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Draws (env, time) positions of window starts uniformly over the `num_starts` oldest rows of each env."""
+        cumulative = np.cumsum(num_starts)
+        rows = self._rng.integers(0, cumulative[-1], size=batch_size)
+        env_ids = np.searchsorted(cumulative, rows, side="right")
+        positions = rows - (cumulative[env_ids] - num_starts[env_ids])
+        return env_ids, self._physical_time_ids(env_ids, positions)
+
+    def _physical_time_ids(self, env_ids: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Maps positions in (oldest to newest) order of each env to their positions in the arrays."""
+        oldest = np.where(self._size[env_ids] == self.env_capacity, self._index[env_ids], 0)
+        return (oldest + positions) % self.env_capacity
+
+    def _crosses_episode_end(self, env_ids: np.ndarray, starts: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Returns which windows hold an episode end before their last row."""
+        if "done" not in self._data or len(offsets) < 2:
+            return np.zeros(len(env_ids), dtype=np.bool_)
+        time_ids = (starts[:, None] + offsets[:-1]) % self.env_capacity
+        done = self._data["done"].reshape(-1)
+        return done[env_ids[:, None] * self.env_capacity + time_ids].any(axis=1)
+
+    def _sample_valid_window_starts(self, batch_size: int, length: int) -> tuple[np.ndarray, np.ndarray]:
+        """Draws window starts uniformly among all the windows not crossing an episode end."""
+        env_ids, positions = [], []
+        for env_id in range(self.num_envs):
+            num_starts = self._size[env_id] - length + 1
+            if num_starts <= 0:
+                continue
+            done = np.asarray(self._data["done"][env_id, self._ordered_time_ids(env_id)], dtype=np.int64)
+            # number of episode ends in the first `length - 1` rows of each window
+            ends = np.concatenate([[0], np.cumsum(done)])
+            valid = np.flatnonzero(ends[length - 1 : length - 1 + num_starts] == ends[:num_starts])
+            env_ids.append(np.full(len(valid), env_id))
+            positions.append(valid)
+
+        all_env_ids, all_positions = np.concatenate(env_ids), np.concatenate(positions)
+        if len(all_env_ids) == 0:
+            raise ValueError(f"No window of {length} rows lies within a single episode.")
+        chosen = self._rng.integers(0, len(all_env_ids), size=batch_size)
+        return all_env_ids[chosen], self._physical_time_ids(all_env_ids[chosen], all_positions[chosen])
+
+    def sample_n_step(self, batch_size: int, n_step: int, gamma: float = 0.99) -> Batch:
+        """Samples `batch_size` rows uniformly with their `n_step` discounted returns.
+
+        `reward` holds the discounted sum of the rewards of the next `n_step` rows of the env, up to
+        the end of the episode or the newest row. `next_obs`, `done`, `terminated` and `truncated`
+        are those of the last summed row, and `discount` is the discount of its bootstrap value.
+        """
+        if n_step < 1:
+            raise ValueError(f"n_step must be positive, but got {n_step=}.")
+        if len(self) == 0:
+            raise ValueError("Cannot sample from an empty buffer.")
+        if "reward" not in self._data or "done" not in self._data:
+            raise ValueError("n-step returns need the reward and done fields.")
+
+        env_ids, time_ids = self._sample_ids(batch_size)
+        batch = self._gather(env_ids, time_ids)
+
+        offsets = np.arange(n_step)
+        flat_ids = env_ids[:, None] * self.env_capacity + (time_ids[:, None] + offsets) % self.env_capacity
+        rewards = self._data["reward"].reshape(-1)[flat_ids]
+        done = self._data["done"].reshape(-1)[flat_ids].astype(np.bool_)
+
+        # the summed rows follow the sampled one up to the newest row and the first episode end
+        num_following = (self._index[env_ids] - 1 - time_ids) % self.env_capacity + 1
+        ended_before = (np.cumsum(done, axis=1) - done) > 0
+        summed = (offsets < num_following[:, None]) & ~ended_before
+        last = summed.sum(axis=1) - 1
+
+        batch["reward"] = (rewards * summed * gamma**offsets).sum(axis=1).astype(rewards.dtype, copy=False)
+        batch["discount"] = (gamma ** (last + 1)).astype(np.float32)
+        last_time_ids = (time_ids + last) % self.env_capacity
+        for key in ["next_obs", "done", "terminated", "truncated"]:
+            if key in self._data:
+                batch[key] = self._data[key][env_ids, last_time_ids]
         return Batch(batch)
 
+    def sequence(self, env_id: int, start: int, length: int) -> Batch:
+        """Returns `length` consecutive rows of an env starting at its `start`-th oldest row.
+
+        The fields are views on the buffer arrays (no copy) unless the window wraps around the ring.
+        """
+        if not 0 <= start <= start + length <= self._size[env_id]:
+            raise IndexError(f"Window [{start}, {start + length}) out of range for env {env_id}.")
+        time_ids = self._ordered_time_ids(env_id)[start : start + length]
+        if length > 0 and time_ids[-1] - time_ids[0] == length - 1:
+            window = slice(time_ids[0], time_ids[0] + length)
+            return Batch({key: value[env_id, window] for key, value in self._data.items()})
+        return Batch(self._gather(np.full(length, env_id), time_ids))
+
     def batchify(self) -> Batch:
-        return Batch(self.buffer)
+        env_ids = np.repeat(np.arange(self.num_envs), self._size)
+        time_ids = np.concatenate([self._ordered_time_ids(env_id) for env_id in range(self.num_envs)])
+        return Batch(self._gather(env_ids, time_ids))
 
     def __len__(self) -> int:
-        return len(self.buffer)
+        return int(self._size.sum())
 
     def __repr__(self) -> str:
         return f"ReplayBuffer(capacity={self.capacity}, buffer length={self.__len__()})"
@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from gymnasium.spaces import Space
+
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.transition import Transition
+
+METADATA_FILE = "metadata.json"
+CURSORS_FILE = "cursors.npy"
+
+
+class MemmapReplayBuffer(ReplayBuffer):
+    """Replay buffer whose fields live in `.npy` files mapped in memory.
+
+    With `mode="w+"` a new buffer is created in `path`, `mode="r+"` reopens it to keep appending
+    and `mode="r"` reopens it read-only (e.g. for training on a collected dataset). Only the pages
+    holding written or sampled rows are brought in memory, so the resident memory does not grow
+    with the size of the dataset. The `info` dicts cannot be mapped and are not stored.
+    """
+
+    _unstored_fields = ("info",)
+
+    def __init__(
+        self,
+        path: str | Path,
+        capacity: int | None = None,
+        observation_space: Space | None = None,
+        action_space: Space | None = None,
+        num_envs: int | None = None,
+        mode: Literal["r", "r+", "w+"] = "w+",
+        seed: int | None = None,
+    ) -> None:
+        if mode not in ["r", "r+", "w+"]:
+            raise ValueError(f"Invalid mode {mode}, must be one of 'r', 'r+' or 'w+'.")
+        self.path = Path(path)
+        self.mode = mode
+
+        if mode == "w+":
+            if capacity is None:
+                raise ValueError("capacity must be given to create a new buffer.")
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._fields: dict[str, dict] = {}
+            super().__init__(capacity, observation_space, action_space, num_envs=num_envs, seed=seed)
+        else:
+            metadata = json.loads((self.path / METADATA_FILE).read_text())
+            self._fields = metadata["fields"]
+            super().__init__(metadata["capacity"], num_envs=metadata["num_envs"], seed=seed)
+            for key in self._fields:
+                self._data[key] = np.load(self.path / f"{key}.npy", mmap_mode=mode)
+
+        # the cursors are mapped too, so that the file always describes the written rows
+        self._cursors = np.lib.format.open_memmap(
+            self.path / CURSORS_FILE,
+            mode=mode,
+            dtype=np.int64,
+            shape=(2, self.num_envs),
+        )
+        self._index, self._size = self._cursors[0], self._cursors[1]
+        self._write_metadata()
+
+    def _write_metadata(self) -> None:
+        if self.mode == "r":
+            return
+        metadata = {
+            "capacity": self.capacity,
+            "num_envs": self.num_envs if self.flatten else None,
+            "fields": self._fields,
+        }
+        (self.path / METADATA_FILE).write_text(json.dumps(metadata, indent=2))
+
+    def _allocate(self, key: str, shape: tuple, dtype: np.dtype | type | None) -> None:
+        self._data[key] = np.lib.format.open_memmap(
+            self.path / f"{key}.npy",
+            mode="w+",
+            dtype=dtype,
+            shape=(self.num_envs, self.env_capacity, *shape),
+        )
+        self._fields[key] = {"shape": list(shape), "dtype": np.dtype(dtype).str}
+        self._write_metadata()
+
+    def push(self, transition: Transition, env_ids: np.ndarray | None = None) -> None:
+        if self.mode == "r":
+            raise ValueError("Cannot push to a buffer opened read-only.")
+        super().push(transition, env_ids)
+
+    def _sample_ids(self, batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+        # reading the rows in storage order keeps the page accesses sequential
+        env_ids, time_ids = super()._sample_ids(batch_size)
+        order = np.lexsort((time_ids, env_ids))
+        return env_ids[order], time_ids[order]
+
+    def flush(self) -> None:
+        """Writes the mapped pages back to the files."""
+        if self.mode == "r":
+            return
+        for value in self._data.values():
+            value.flush()  # type: ignore[attr-defined]
+        self._cursors.flush()
+
+    def __repr__(self) -> str:
+        return f"MemmapReplayBuffer(path={self.path}, capacity={self.capacity}, buffer length={self.__len__()})"
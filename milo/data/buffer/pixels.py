@@ -0,0 +1,238 @@
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+
+def is_image_shape(shape: tuple | None, dtype: Any) -> bool:
+    """Returns True for `(height, width, channels)` uint8 layouts, as produced by renders and pixel observations."""
+    return shape is not None and len(shape) == 3 and np.dtype(dtype) == np.uint8
+
+
+class PixelStorage:
+    """Frame storage laid out as `(env, time, height, width, channels)` in chunks along time.
+
+    Frames must be uint8 and can be downscaled at write time to `frame_size` (nearest neighbour).
+    Chunks of `chunk_size` rows are only allocated once written, and with `compress` every full
+    chunk is zlib-compressed, recently read compressed chunks being kept in a small cache.
+
+    When used for observations, the storage also rebuilds the next observations from the
+    observation stored in the following row, so that every frame is only stored once.
+    """
+
+    dtype = np.dtype(np.uint8)
+
+    def __init__(
+        self,
+        num_envs: int,
+        env_capacity: int,
+        frame_shape: tuple | None = None,
+        frame_size: tuple[int, int] | None = None,
+        chunk_size: int = 256,
+        compress: bool = False,
+        compression_level: int = 1,
+        cache_size: int = 16,
+    ) -> None:
+        self.num_envs = num_envs
+        self.env_capacity = env_capacity
+        self.frame_size = frame_size
+        self.chunk_size = min(chunk_size, env_capacity)
+        self.compress = compress
+        self.compression_level = compression_level
+        self.cache_size = cache_size
+
+        self._num_chunks = -(-env_capacity // self.chunk_size)
+        self._chunks: list[list[np.ndarray | bytes | None]] = [[None] * self._num_chunks for _ in range(num_envs)]
+        self._cache: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+        self._frame_shape: tuple | None = None
+        self._resize_ids: tuple[np.ndarray, np.ndarray] | None = None
+        if frame_shape is not None:
+            self._set_frame_shape(frame_shape)
+
+        # bookkeeping to rebuild next frames, see `set_next` and `get_next`
+        self._newest = np.full(num_envs, -1, dtype=np.int64)
+        self._pending: np.ndarray | None = None
+        self._has_override = np.zeros((num_envs, env_capacity), dtype=np.bool_)
+        self._overrides: dict[tuple[int, int], np.ndarray] = {}
+
+    def _set_frame_shape(self, frame_shape: tuple) -> None:
+        height, width, channels = frame_shape
+        if self.frame_size is not None:
+            # nearest neighbour rows and columns, computed once
+            self._resize_ids = (
+                (np.arange(self.frame_size[0]) * height // self.frame_size[0])[:, None],
+                np.arange(self.frame_size[1]) * width // self.frame_size[1],
+            )
+            height, width = self.frame_size
+        self._frame_shape = (height, width, channels)
+
+    @property
+    def shape(self) -> tuple:
+        if self._frame_shape is None:
+            raise ValueError("The frame shape is unknown until the first frames are written.")
+        return (self.num_envs, self.env_capacity, *self._frame_shape)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the number of bytes held by the allocated (and possibly compressed) chunks."""
+        return sum(
+            len(chunk) if isinstance(chunk, bytes) else chunk.nbytes
+            for env in self._chunks
+            for chunk in env
+            if chunk is not None
+        )
+
+    def reset(self) -> None:
+        # the allocated chunks are kept, they are overwritten by the next writes
+        self._cache.clear()
+        self._newest[:] = -1
+        self._has_override[:] = False
+        self._overrides.clear()
+
+    def _process(self, frames: Any) -> np.ndarray:
+        frames = np.asarray(frames)
+        if frames.dtype != np.uint8:
+            raise ValueError(f"Frames must be stored as uint8, but got {frames.dtype}.")
+        if self._frame_shape is None:
+            self._set_frame_shape(frames.shape[-3:])
+        if self._resize_ids is not None:
+            rows, columns = self._resize_ids
+            frames = frames[..., rows, columns, :]
+        return frames
+
+    def _chunk_length(self, chunk_id: int) -> int:
+        return min(self.chunk_size, self.env_capacity - chunk_id * self.chunk_size)
+
+    def _writable_chunk(self, env_id: int, chunk_id: int) -> np.ndarray:
+        chunk = self._chunks[env_id][chunk_id]
+        if chunk is None:
+            chunk = np.empty((self._chunk_length(chunk_id), *self.shape[2:]), dtype=np.uint8)
+        elif isinstance(chunk, bytes):
+            # the ring wrapped around, the chunk becomes hot again
+            chunk = self._decompress(chunk, chunk_id)
+            self._cache.pop((env_id, chunk_id), None)
+        self._chunks[env_id][chunk_id] = chunk
+        return chunk
+
+    def _readable_chunk(self, env_id: int, chunk_id: int) -> np.ndarray:
+        chunk = self._chunks[env_id][chunk_id]
+        if chunk is None:
+            raise IndexError(f"No frame was written in chunk {chunk_id} of env {env_id}.")
+        if not isinstance(chunk, bytes):
+            return chunk
+
+        key = (env_id, chunk_id)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        frames = self._decompress(chunk, chunk_id)
+        self._cache[key] = frames
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return frames
+
+    def _decompress(self, chunk: bytes, chunk_id: int) -> np.ndarray:
+        frames = np.frombuffer(zlib.decompress(chunk), dtype=np.uint8)
+        return frames.reshape(self._chunk_length(chunk_id), *self.shape[2:]).copy()
+
+    def _normalize_index(self, index: tuple) -> tuple[np.ndarray, np.ndarray]:
+        env_ids, time_ids = index
+        if isinstance(time_ids, slice):
+            time_ids = np.arange(self.env_capacity)[time_ids]
+        env_ids, time_ids = np.broadcast_arrays(
+            np.asarray(env_ids, dtype=np.int64),
+            np.asarray(time_ids, dtype=np.int64),
+        )
+        return env_ids, time_ids
+
+    def __setitem__(self, index: tuple, frames: Any) -> None:
+        env_ids, time_ids = self._normalize_index(index)
+        frames = self._process(frames).reshape(-1, *self.shape[2:])
+
+        for env_id, time_id, frame in zip(env_ids.ravel(), time_ids.ravel(), frames, strict=True):
+            # the row is overwritten, so is the next frame it may have kept
+            if self._has_override[env_id, time_id]:
+                self._has_override[env_id, time_id] = False
+                del self._overrides[(env_id, time_id)]
+
+            # the stored frame is the next frame of the previous row, unless the episode was
+            # interrupted (e.g. by a reset of the envs), in which case the next frame is kept apart
+            newest = self._newest[env_id]
+            if (
+                self._pending is not None
+                and newest >= 0
+                and time_id == (newest + 1) % self.env_capacity
+                and not np.array_equal(frame, self._pending[env_id])
+            ):
+                self._has_override[env_id, newest] = True
+                self._overrides[(env_id, newest)] = self._pending[env_id].copy()
+
+            chunk_id, offset = divmod(int(time_id), self.chunk_size)
+            chunk = self._writable_chunk(env_id, chunk_id)
+            chunk[offset] = frame
+            if self.compress and offset == len(chunk) - 1:
+                self._chunks[env_id][chunk_id] = zlib.compress(chunk.tobytes(), self.compression_level)
+
+    def __getitem__(self, index: tuple) -> np.ndarray:
+        env_ids, time_ids = self._normalize_index(index)
+        out = np.empty((*env_ids.shape, *self.shape[2:]), dtype=np.uint8)
+        self._read(env_ids.ravel(), time_ids.ravel(), out.reshape(-1, *self.shape[2:]))
+        return out
+
+    def _read(self, env_ids: np.ndarray, time_ids: np.ndarray, out: np.ndarray) -> None:
+        if len(env_ids) == 0:
+            return
+        # read each touched chunk once
+        keys = env_ids * self._num_chunks + time_ids // self.chunk_size
+        order = np.argsort(keys, kind="stable")
+        for group in np.split(order, np.flatnonzero(np.diff(keys[order])) + 1):
+            env_id, chunk_id = divmod(int(keys[group[0]]), self._num_chunks)
+            chunk = self._readable_chunk(env_id, chunk_id)
+            out[group] = chunk[time_ids[group] - chunk_id * self.chunk_size]
+
+    def set_next(self, env_ids: np.ndarray, time_ids: np.ndarray, frames: Any) -> None:
+        """Records the next frames of the newest rows, which are the frames of the rows pushed next."""
+        frames = self._process(frames).reshape(-1, *self.shape[2:])
+        if self._pending is None:
+            self._pending = np.zeros((self.num_envs, *self.shape[2:]), dtype=np.uint8)
+        self._newest[env_ids] = time_ids
+        self._pending[env_ids] = frames
+
+    def get_next(self, env_ids: np.ndarray, time_ids: np.ndarray) -> np.ndarray:
+        """Rebuilds the next frames of the given rows from the frames of the following rows."""
+        env_ids, time_ids = env_ids.ravel(), time_ids.ravel()
+        out = np.empty((len(env_ids), *self.shape[2:]), dtype=np.uint8)
+
+        newest = time_ids == self._newest[env_ids]
+        if self._pending is not None:
+            out[newest] = self._pending[env_ids[newest]]
+        following = np.flatnonzero(~newest)
+        frames = np.empty((len(following), *self.shape[2:]), dtype=np.uint8)
+        self._read(env_ids[following], (time_ids[following] + 1) % self.env_capacity, frames)
+        out[following] = frames
+
+        for i in np.flatnonzero(self._has_override[env_ids, time_ids]):
+            out[i] = self._overrides[(env_ids[i], time_ids[i])]
+        return out
+
+
+class NextFrameView:
+    """Exposes the next frames rebuilt by a `PixelStorage` with the same indexing as the storage."""
+
+    dtype = PixelStorage.dtype
+
+    def __init__(self, storage: PixelStorage) -> None:
+        self.storage = storage
+
+    @property
+    def shape(self) -> tuple:
+        return self.storage.shape
+
+    def __setitem__(self, index: tuple, frames: Any) -> None:
+        env_ids, time_ids = self.storage._normalize_index(index)
+        self.storage.set_next(env_ids.ravel(), time_ids.ravel(), frames)
+
+    def __getitem__(self, index: tuple) -> np.ndarray:
+        env_ids, time_ids = self.storage._normalize_index(index)
+        return self.storage.get_next(env_ids, time_ids).reshape(*env_ids.shape, *self.shape[2:])
@@ -0,0 +1,105 @@
+import numpy as np
+from gymnasium.spaces import Space
+
+from milo.data.batch import Batch
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.buffer.segment_tree import MinTree, SumTree
+from milo.data.transition import Transition
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """Replay buffer sampling rows proportionally to `priority ** alpha` (Schaul et al., 2016).
+
+    Sampled batches carry the `indices` of their rows, to be passed back to `update_priorities`,
+    and the importance sampling `weights` correcting for the non-uniform sampling.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_space: Space | None = None,
+        action_space: Space | None = None,
+        num_envs: int | None = None,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        seed: int | None = None,
+    ) -> None:
+        assert alpha >= 0, f"alpha must be non-negative, but got {alpha=}."
+        assert beta >= 0, f"beta must be non-negative, but got {beta=}."
+        self.alpha = alpha
+        self.beta = beta
+        self._max_priority = 1.0
+
+        # one leaf per row, indexed like the flattened (env, time) storage
+        size = (capacity // (num_envs or 1)) * (num_envs or 1)
+        self._sum_tree = SumTree(size)
+        self._min_tree = MinTree(size)
+
+        super().__init__(capacity, observation_space, action_space, num_envs=num_envs, seed=seed)
+
+    def reset(self) -> None:
+        super().reset()
+        self._sum_tree.clear()
+        self._min_tree.clear()
+        self._max_priority = 1.0
+
+    def push(self, transition: Transition, env_ids: np.ndarray | None = None) -> None:
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+        indices = env_ids * self.env_capacity + self._index[env_ids]
+        super().push(transition, env_ids)
+
+        # new rows get the highest priority so that they are sampled at least once
+        priorities = self._max_priority**self.alpha
+        self._sum_tree.update(indices, priorities)
+        self._min_tree.update(indices, priorities)
+
+    @property
+    def schema(self) -> dict[str, dict]:
+        # the fields of the priorities are added to the schema cached by the base buffer, rebuilt with new fields
+        schema = super().schema
+        if "indices" not in schema:
+            schema["indices"] = {"shape": [], "dtype": np.dtype(np.int64).str}
+            schema["weights"] = {"shape": [], "dtype": np.dtype(np.float32).str}
+        return schema
+
+    def sample(
+        self,
+        batch_size: int,
+        reuse_memory: bool = False,
+        keys: list[str] | None = None,
+        beta: float | None = None,
+    ) -> Batch:
+        """Samples `batch_size` rows with one draw in each of `batch_size` equal priority segments."""
+        if len(self) == 0:
+            raise ValueError("Cannot sample from an empty buffer.")
+        keys = self._select_keys(keys)
+        beta = self.beta if beta is None else beta
+
+        total = self._sum_tree.reduce()
+        prefix_sums = (np.arange(batch_size) + self._rng.random(batch_size)) * (total / batch_size)
+        indices = self._sum_tree.find_prefix_sum_index(prefix_sums)
+
+        # importance sampling weights, normalized by the largest possible weight
+        probabilities = self._sum_tree[indices] / total
+        min_probability = self._min_tree.reduce() / total
+        weights = (probabilities / min_probability) ** -beta
+
+        out = self._get_sample_out(batch_size) if reuse_memory else None
+        batch = self._gather(indices // self.env_capacity, indices % self.env_capacity, out, keys=keys)
+        # the indices and weights are needed to update the priorities
+        batch["indices"] = indices
+        batch["weights"] = weights.astype(np.float32)
+        return Batch(batch, schema=self.schema, size=batch_size)
+
+    def update_priorities(self, indices: np.ndarray, priorities: np.ndarray) -> None:
+        """Sets the priorities of the rows at `indices`, as returned in a sampled batch."""
+        priorities = np.asarray(priorities, dtype=np.float64).reshape(-1)
+        assert np.all(priorities > 0), "priorities must be positive."
+        self._max_priority = max(self._max_priority, float(priorities.max()))
+
+        priorities = priorities**self.alpha
+        self._sum_tree.update(indices, priorities)
+        self._min_tree.update(indices, priorities)
+
+    def __repr__(self) -> str:
+        return f"PrioritizedReplayBuffer(capacity={self.capacity}, buffer length={self.__len__()}, alpha={self.alpha}, beta={self.beta})"
@@ -0,0 +1,60 @@
+# inspired from: https://github.com/openai/baselines/blob/master/baselines/common/segment_tree.py
+
+import numpy as np
+
+
+class SegmentTree:
+    """Array-based binary tree where each node holds the reduction of its two children.
+
+    Leaves live in the second half of the array and the root at index 1. All operations are
+    vectorized over a batch of leaves and cost O(log n) NumPy calls.
+    """
+
+    def __init__(self, size: int, operation: np.ufunc, neutral_element: float) -> None:
+        self.size = size
+        # a complete tree keeps all the leaves at the same depth
+        self._capacity = 1 << max(size - 1, 0).bit_length()
+        self._operation = operation
+        self._neutral_element = neutral_element
+        self._tree = np.full(2 * self._capacity, neutral_element, dtype=np.float64)
+
+    def clear(self) -> None:
+        self._tree.fill(self._neutral_element)
+
+    def __getitem__(self, indices: np.ndarray) -> np.ndarray:
+        return self._tree[self._capacity + np.asarray(indices)]
+
+    def update(self, indices: np.ndarray, values: np.ndarray | float) -> None:
+        """Sets the given leaves and recomputes their ancestors level by level."""
+        nodes = self._capacity + np.asarray(indices, dtype=np.int64).reshape(-1)
+        self._tree[nodes] = values
+        while len(nodes) > 0 and nodes[0] > 1:
+            nodes = np.unique(nodes // 2)
+            self._tree[nodes] = self._operation(self._tree[2 * nodes], self._tree[2 * nodes + 1])
+
+    def reduce(self) -> float:
+        """Returns the reduction over all the leaves."""
+        return float(self._tree[1])
+
+
+class SumTree(SegmentTree):
+    def __init__(self, size: int) -> None:
+        super().__init__(size, np.add, 0.0)
+
+    def find_prefix_sum_index(self, prefix_sums: np.ndarray) -> np.ndarray:
+        """Returns for each prefix sum the first leaf at which the cumulative sum exceeds it."""
+        prefix_sums = np.array(prefix_sums, dtype=np.float64)
+        nodes = np.ones(len(prefix_sums), dtype=np.int64)
+        while len(nodes) > 0 and nodes[0] < self._capacity:
+            left = 2 * nodes
+            left_sums = self._tree[left]
+            go_right = prefix_sums >= left_sums
+            prefix_sums -= left_sums * go_right
+            nodes = left + go_right
+        # rounding errors can push a prefix sum close to the total past the last leaf
+        return np.minimum(nodes - self._capacity, self.size - 1)
+
+
+class MinTree(SegmentTree):
+    def __init__(self, size: int) -> None:
+        super().__init__(size, np.minimum, np.inf)
@@ -0,0 +1,134 @@
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+from gymnasium.spaces import Space
+
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.transition import Transition
+
+
+class SharedReplayBuffer(ReplayBuffer):
+    """Replay buffer whose arrays live in `multiprocessing.shared_memory` blocks.
+
+    The buffer can be pickled to (or attached from its `handle` in) other processes, which then
+    read and write the same memory without copies. Each writer owns a set of envs (`env_ids`) and
+    is the only one moving their cursors, so collectors write concurrently without locking while
+    learners sample. A row being overwritten while it is sampled may be read half updated.
+
+    All the fields are allocated at creation: observations and actions from the spaces, frames
+    only if `pixel_shape` is given. The `info` dicts are not stored.
+    """
+
+    _unstored_fields = ("info",)
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_space: Space,
+        action_space: Space,
+        num_envs: int | None = None,
+        pixel_shape: tuple | None = None,
+        env_ids: np.ndarray | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self._blocks: dict[str, shared_memory.SharedMemory] = {}
+        self._fields: dict[str, dict] = {}
+        self._owner = True
+        super().__init__(capacity, observation_space, action_space, num_envs=num_envs, seed=seed)
+
+        for key in ["reward", "done", "terminated", "truncated"]:
+            self._allocate(key, (), np.float64 if key == "reward" else np.bool_)
+        if pixel_shape is not None:
+            self._allocate("pixels", pixel_shape, np.uint8)
+
+        self._map_cursors(shared_memory.SharedMemory(create=True, size=2 * self.num_envs * 8))
+        self.reset()
+        self.env_ids = self._owned_env_ids(env_ids)
+
+    @classmethod
+    def attach(
+        cls,
+        handle: dict[str, Any],
+        env_ids: np.ndarray | None = None,
+        seed: int | None = None,
+    ) -> "SharedReplayBuffer":
+        """Maps, in the current process, the shared buffer described by `handle`."""
+        buffer = cls.__new__(cls)
+        buffer._attach(handle, env_ids, seed)
+        return buffer
+
+    def _attach(self, handle: dict[str, Any], env_ids: np.ndarray | None, seed: int | None) -> None:
+        self._blocks = {}
+        self._fields = handle["fields"]
+        self._owner = False
+        ReplayBuffer.__init__(self, handle["capacity"], num_envs=handle["num_envs"], seed=seed)
+
+        for key, field in self._fields.items():
+            block = shared_memory.SharedMemory(name=field["name"])
+            self._blocks[key] = block
+            self._data[key] = np.ndarray(
+                (self.num_envs, self.env_capacity, *field["shape"]),
+                dtype=field["dtype"],
+                buffer=block.buf,
+            )
+        self._map_cursors(shared_memory.SharedMemory(name=handle["cursors"]))
+        self.env_ids = self._owned_env_ids(env_ids)
+
+    @property
+    def handle(self) -> dict[str, Any]:
+        """Returns a picklable description of the shared blocks, to be passed to `attach`."""
+        return {
+            "capacity": self.capacity,
+            "num_envs": self.num_envs if self.flatten else None,
+            "fields": self._fields,
+            "cursors": self._blocks["_cursors"].name,
+        }
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"handle": self.handle, "env_ids": self.env_ids}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self._attach(state["handle"], state["env_ids"], seed=None)
+
+    def _owned_env_ids(self, env_ids: np.ndarray | None) -> np.ndarray:
+        return np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+
+    def _map_cursors(self, block: shared_memory.SharedMemory) -> None:
+        self._blocks["_cursors"] = block
+        cursors: np.ndarray = np.ndarray((2, self.num_envs), dtype=np.int64, buffer=block.buf)
+        self._index, self._size = cursors[0], cursors[1]
+
+    def _allocate(self, key: str, shape: tuple, dtype: np.dtype | type | None) -> None:
+        dtype = np.dtype(dtype)
+        shape = (self.num_envs, self.env_capacity, *shape)
+        block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+        self._blocks[key] = block
+        self._data[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        self._data[key].fill(0)
+        self._fields[key] = {"name": block.name, "shape": list(shape[2:]), "dtype": dtype.str}
+
+    def _allocate_like(self, key: str, value: np.ndarray) -> None:
+        raise ValueError(f"Field '{key}' must be declared when the shared buffer is created.")
+
+    def push(self, transition: Transition, env_ids: np.ndarray | None = None) -> None:
+        """Writes a transition in the rows of `env_ids`, by default the envs owned by this process."""
+        super().push(transition, self.env_ids if env_ids is None else env_ids)
+
+    def close(self) -> None:
+        """Unmaps the shared blocks from this process."""
+        self._data.clear()
+        self._index = self._size = np.zeros(self.num_envs, dtype=np.int64)
+        for block in self._blocks.values():
+            block.close()
+
+    def unlink(self) -> None:
+        """Frees the shared blocks, to be called once by the process that created the buffer."""
+        self.close()
+        if self._owner:
+            for block in self._blocks.values():
+                block.unlink()
+        self._blocks.clear()
+
+    def __repr__(self) -> str:
+        return f"SharedReplayBuffer(capacity={self.capacity}, buffer length={self.__len__()})"
@@ -1,24 +1,34 @@
 # inspired from: https://github.com/aai-institute/tianshou/blob/master/tianshou/data/collector.py
 
+import contextlib
 import time
 import warnings
 from typing import Any
 
 import gymnasium as gym
 import numpy as np
+import torch
 from gymnasium.vector import SyncVectorEnv, VectorEnv
 
+from milo.data.batch import TensorConverter
 from milo.data.buffer.base import ReplayBuffer
-from milo.data.transition import Transition
+from milo.data.dataset import DatasetWriter
+from milo.data.stats import CollectStats
+from milo.data.transition import Transition, extract_info
+from milo.policy.base import BasePolicy
 
 
 class Collector:
     def __init__(
         self,
-        policy: None,
+        policy: BasePolicy | None,
         env: gym.Env | VectorEnv,
         buffer: ReplayBuffer | None = None,
         exploration_noise: bool = False,
+        num_groups: int = 1,
+        ready_batch_size: int | None = None,
+        dataset: DatasetWriter | None = None,
+        info_schema: dict[str, Any] | None = None,
     ) -> None:
         super().__init__()
         if isinstance(env, gym.Env) and not hasattr(env, "env_fns"):
@@ -28,9 +38,29 @@ class Collector:
             self.env = env  # type: ignore
 
         self.env_num = self.env.num_envs
+        if not 1 <= num_groups <= self.env_num:
+            raise ValueError(f"num_groups must be in [1, {self.env_num}], but got {num_groups=}.")
+        if ready_batch_size is not None and not 1 <= ready_batch_size <= self.env_num:
+            raise ValueError(f"ready_batch_size must be in [1, {self.env_num}], but got {ready_batch_size=}.")
+        if num_groups > 1 and ready_batch_size is not None:
+            raise ValueError("num_groups and ready_batch_size cannot be used together.")
+        if (num_groups > 1 or ready_batch_size is not None) and not hasattr(self.env, "step_async_ids"):
+            raise ValueError("Collecting with groups of envs requires milo's AsyncVectorEnv.")
+        # with several groups, each group steps while the actions and transitions of the others are processed
+        self.num_groups = num_groups
+        self._groups = np.array_split(np.arange(self.env_num), num_groups)
+        # with a ready batch size, the collector acts on the first envs to finish their step
+        self.ready_batch_size = ready_batch_size
         self.exploration_noise = exploration_noise
         self.buffer = self._setup_buffer(buffer)
+        # the collected transitions are also streamed to the dataset, which is closed with the collector
+        self.dataset = dataset
+        # only the info keys listed in the schema are kept, as typed arrays (see `extract_info`),
+        # the info is not stored without schema
+        self.info_schema = info_schema
         self.policy = policy
+        # observations are copied in the same device tensor at every step (shared memory on CPU)
+        self._obs_converter = TensorConverter(policy.device if policy is not None else "cpu")
 
         self.collect_step: int = 0
         self.collect_episode: int = 0
@@ -41,9 +71,16 @@ class Collector:
         self._pre_info: dict | None = None
         self._is_closed: bool = False
 
+        # running episodes, the envs flagged in `_autoreset` are reset by their next step
+        self._episode_returns = np.zeros(self.env_num, dtype=np.float64)
+        self._episode_lengths = np.zeros(self.env_num, dtype=np.int64)
+        self._autoreset = np.zeros(self.env_num, dtype=np.bool_)
+
     def close(self) -> None:
         """Close the collector and the environment."""
         self.env.close()
+        if self.dataset is not None:
+            self.dataset.close()
         self._pre_obs = None
         self._pre_info = None
         self._is_closed = True
@@ -55,9 +92,19 @@ class Collector:
 
     def _setup_buffer(self, buffer: ReplayBuffer | None) -> ReplayBuffer:
         if buffer is None:
-            return ReplayBuffer(1000000)
-        else:
-            return buffer
+            return ReplayBuffer(
+                1000000,
+                observation_space=self.env.single_observation_space,
+                action_space=self.env.single_action_space,
+                num_envs=self.env_num,
+                pixel_storage_kwargs={},
+            )
+        # a buffer built without num_envs stores each vector step in a single row
+        if buffer.flatten and buffer.num_envs != self.env_num:
+            raise ValueError(f"The buffer stores {buffer.num_envs} envs, but the collector steps {self.env_num}.")
+        if not buffer.flatten and (self.num_groups > 1 or self.ready_batch_size is not None):
+            raise ValueError("Collecting with groups of envs requires a buffer with one row per env (num_envs).")
+        return buffer
 
     def reset(
         self,
@@ -97,14 +144,67 @@ class Collector:
             gym_reset_kwargs["seed"] = seed
 
         self._pre_obs, self._pre_info = self.env.reset(**gym_reset_kwargs)
-
-    def _add_to_buffer(self, transition: Transition) -> None:
-        if self.buffer is not None:
+        self._episode_returns[:] = 0.0
+        self._episode_lengths[:] = 0
+        self._autoreset[:] = False
+
+    def _add_to_buffer(self, transition: Transition, env_ids: np.ndarray | None = None) -> None:
+        if self.info_schema is None:
+            transition.info = None
+        elif not isinstance(transition.info, np.ndarray):
+            transition.info = extract_info(transition.info or {}, self.info_schema, len(transition.reward))
+
+        # the vector steps are stored whole, including the steps resetting some of the envs
+        if self.buffer is not None and not self.buffer.flatten:
             self.buffer.push(transition)
-
-    def _get_actions(self) -> np.ndarray:
-        # TODO: implement with policy
-        return self.env.action_space.sample()
+        per_env_buffer = self.buffer is not None and self.buffer.flatten
+        if not per_env_buffer and self.dataset is None:
+            return
+
+        # the steps resetting the envs after the end of their episode are not transitions
+        env_ids = np.arange(self.env_num) if env_ids is None else np.asarray(env_ids)
+        kept = ~self._autoreset[env_ids]
+        if not kept.all():
+            if not kept.any():
+                return
+            for key in transition.__slots__:
+                setattr(transition, key, _select_rows(getattr(transition, key), kept))
+            env_ids = env_ids[kept]
+
+        if per_env_buffer:
+            self.buffer.push(transition, env_ids)
+        if self.dataset is not None:
+            self.dataset.push(transition, env_ids)
+
+    def _pop_frames(self, info: dict, required: bool = False) -> np.ndarray | None:
+        """Takes out of `info` the frames rendered in the workers by `RenderInfo`."""
+        info.pop("_pixels", None)
+        frames = info.pop("pixels", None)
+        if required and frames is None:
+            raise ValueError("Rendering groups of envs requires the envs to render in their workers, see RenderInfo.")
+        return frames
+
+    def _get_actions(
+        self,
+        obs: np.ndarray,
+        random: bool = False,
+        no_grad: bool = True,
+        env_ids: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Returns the actions of the envs (all of them by default), computed in one batched forward pass of the policy."""
+        if random or self.policy is None:
+            actions = self._action_space.sample()
+            return actions if env_ids is None else actions[env_ids]
+
+        # one reused tensor per batch size, the groups of envs may have different sizes
+        obs_tensor = self._obs_converter(f"obs_{len(obs)}", obs)
+        with torch.inference_mode(no_grad):
+            actions = self.policy(obs_tensor)
+        actions = actions.detach().cpu().numpy()
+
+        if self.exploration_noise:
+            actions = self.policy.exploration_noise(actions)
+        return actions
 
     def collect(
         self,
@@ -115,7 +215,8 @@ class Collector:
         no_grad: bool = True,
         reset_before_collect: bool = False,
         gym_reset_kwargs: dict[str, Any] | None = None,
-    ) -> None:
+    ) -> CollectStats:
+        """Steps the envs for `n_step` vector steps or until `n_episode` episodes ended, filling the buffer."""
         if (n_step is not None and n_episode is not None) or (n_step is None and n_episode is None):
             raise ValueError(
                 f"Either n_step or n_episode must be specified (but not both or none), but got {n_step=}, {n_episode=}.",
@@ -131,7 +232,7 @@ class Collector:
                 f"Got {n_episode=}, while the number of environments is {self.env_num}.",
             )
 
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         if reset_before_collect:
             self.reset(reset_buffer=False, gym_reset_kwargs=gym_reset_kwargs)
@@ -139,35 +240,318 @@ class Collector:
         if self._pre_obs is None:
             raise ValueError("The environment must be reset before collecting.")
 
-        obs = self._pre_obs
-        pixels = None
+        if not render and "pixels" in self.buffer.schema:
+            raise ValueError("The buffer stores pixels, the steps must be collected with render=True.")
+
+        episodes: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        timings = dict.fromkeys(["action", "step", "render", "buffer"], 0.0)
+        try:
+            if self.ready_batch_size is not None:
+                obs, step_count = self._collect_ready_first(
+                    self._pre_obs,
+                    n_step,
+                    n_episode,
+                    random,
+                    render,
+                    no_grad,
+                    episodes,
+                    timings,
+                )
+            elif self.num_groups > 1:
+                obs, step_count = self._collect_pipelined(
+                    self._pre_obs,
+                    n_step,
+                    n_episode,
+                    random,
+                    render,
+                    no_grad,
+                    episodes,
+                    timings,
+                )
+            else:
+                obs, step_count = self._collect_serial(
+                    self._pre_obs,
+                    n_step,
+                    n_episode,
+                    random,
+                    render,
+                    no_grad,
+                    episodes,
+                    timings,
+                )
+        except BaseException:
+            # the steps still sent to the workers are waited for, so that the envs can be reset
+            self._drain_steps()
+            raise
+        num_collected_episodes = sum(len(returns) for returns, _, _ in episodes)
+
+        self._pre_obs = obs
 
+        # generate statistics
+        self.collect_step += step_count
+        self.collect_episode += num_collected_episodes
+        collect_time = max(time.perf_counter() - start_time, 1e-9)
+        self.collect_time += collect_time
+
+        return CollectStats(
+            n_collected_steps=step_count,
+            n_collected_episodes=num_collected_episodes,
+            collect_time=collect_time,
+            episode_returns=np.concatenate([returns for returns, _, _ in episodes] or [np.zeros(0)]),
+            episode_lengths=np.concatenate([lengths for _, lengths, _ in episodes] or [np.zeros(0, dtype=np.int64)]),
+            episode_env_ids=np.concatenate([env_ids for _, _, env_ids in episodes] or [np.zeros(0, dtype=np.int64)]),
+            timings=timings,
+            num_envs=self.env_num,
+        )
+
+    def _drain_steps(self) -> None:
+        """Waits for the pending steps of the groups of envs, dropping their results."""
+        if self.num_groups == 1 and self.ready_batch_size is None:
+            return
+        stepping = self.env.stepping_ids  # type: ignore[attr-defined]
+        if len(stepping) > 0:
+            with contextlib.suppress(Exception):
+                self.env.step_wait_ids(stepping)  # type: ignore[attr-defined]
+
+    def _track_episodes(
+        self,
+        rewards: np.ndarray,
+        done: np.ndarray,
+        env_ids: np.ndarray,
+        episodes: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ) -> None:
+        """Accumulates the rewards and lengths of the running episodes of `env_ids`, recording the ended ones."""
+        # the steps resetting the envs do not belong to any episode
+        self._episode_returns[env_ids] += rewards
+        self._episode_lengths[env_ids] += ~self._autoreset[env_ids]
+        self._autoreset[env_ids] = done
+        if done.any():
+            ended = env_ids[done]
+            episodes.append((self._episode_returns[ended], self._episode_lengths[ended], ended))
+            self._episode_returns[ended] = 0.0
+            self._episode_lengths[ended] = 0
+
+    def _collect_serial(
+        self,
+        obs: np.ndarray,
+        n_step: int | None,
+        n_episode: int | None,
+        random: bool,
+        render: bool,
+        no_grad: bool,
+        episodes: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        timings: dict[str, float],
+    ) -> tuple[np.ndarray, int]:
+        """Steps all the envs together, returns the last observations and the number of vector steps."""
+        all_env_ids = np.arange(self.env_num)
+        pixels: tuple | np.ndarray | None = None
         step_count: int = 0
         num_collected_episodes: int = 0
 
         while True:
-            actions = self._get_actions()
+            t0 = time.perf_counter()
+            actions = self._get_actions(obs, random=random, no_grad=no_grad)
+            t1 = time.perf_counter()
             next_obs, rewards, terminated, truncated, info = self.env.step(actions)  # type: ignore
+            t2 = time.perf_counter()
             done = terminated | truncated
 
+            # the frames rendered in the workers come with the step results
+            frames = self._pop_frames(info)
             if render:
-                pixels = self.env.render()
+                pixels = frames if frames is not None else self.env.render()
+            t3 = time.perf_counter()
 
             transition = Transition(obs, actions, rewards, next_obs, done, terminated, truncated, info, pixels)
             self._add_to_buffer(transition)
+            t4 = time.perf_counter()
+
+            timings["action"] += t1 - t0
+            timings["step"] += t2 - t1
+            timings["render"] += t3 - t2
+            timings["buffer"] += t4 - t3
 
             obs = next_obs
+            self._track_episodes(rewards, done, all_env_ids, episodes)
 
             step_count += 1
-            num_collected_episodes += sum(done)
+            num_collected_episodes += int(done.sum())
 
             if n_step is not None and step_count >= n_step:
                 break
             if n_episode is not None and num_collected_episodes >= n_episode:
                 break
 
-        # generate statistics
-        self.collect_step += step_count
-        self.collect_episode += num_collected_episodes
-        collect_time = max(time.time() - start_time, 1e-9)
-        self.collect_time += collect_time
+        return obs, step_count
+
+    def _collect_pipelined(
+        self,
+        obs: np.ndarray,
+        n_step: int | None,
+        n_episode: int | None,
+        random: bool,
+        render: bool,
+        no_grad: bool,
+        episodes: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        timings: dict[str, float],
+    ) -> tuple[np.ndarray, int]:
+        """Steps the groups of envs in turn, each group stepping while the results of the others are processed.
+
+        Returns the last observations and the number of env steps divided by the number of envs.
+        """
+        obs = np.array(obs)
+        actions: list[np.ndarray] = []
+        for group in self._groups:
+            t0 = time.perf_counter()
+            actions.append(self._get_actions(obs[group], random=random, no_grad=no_grad, env_ids=group))
+            t1 = time.perf_counter()
+            self.env.step_async_ids(actions[-1], group)  # type: ignore[attr-defined]
+            timings["action"] += t1 - t0
+            timings["step"] += time.perf_counter() - t1
+
+        in_flight = [True] * len(self._groups)
+        group_steps = np.zeros(len(self._groups), dtype=np.int64)
+        num_collected_episodes: int = 0
+
+        while any(in_flight):
+            for i, group in enumerate(self._groups):
+                if not in_flight[i]:
+                    continue
+                t0 = time.perf_counter()
+                next_obs, rewards, terminated, truncated, info = self.env.step_wait_ids(group)  # type: ignore
+                t1 = time.perf_counter()
+                done = terminated | truncated
+
+                pixels = self._pop_frames(info, required=render)
+                transition = Transition(
+                    obs[group],
+                    actions[i],
+                    rewards,
+                    next_obs,
+                    done,
+                    terminated,
+                    truncated,
+                    info,
+                    pixels if render else None,
+                )
+                self._add_to_buffer(transition, env_ids=group)
+                t2 = time.perf_counter()
+
+                obs[group] = next_obs
+                self._track_episodes(rewards, done, group, episodes)
+                group_steps[i] += 1
+                num_collected_episodes += int(done.sum())
+
+                # once enough steps or episodes are collected, the groups still stepping are drained
+                in_flight[i] = not (
+                    (n_step is not None and group_steps[i] >= n_step)
+                    or (n_episode is not None and num_collected_episodes >= n_episode)
+                )
+                t3 = t4 = time.perf_counter()
+                if in_flight[i]:
+                    actions[i] = self._get_actions(obs[group], random=random, no_grad=no_grad, env_ids=group)
+                    t3 = time.perf_counter()
+                    self.env.step_async_ids(actions[i], group)  # type: ignore[attr-defined]
+                    t4 = time.perf_counter()
+
+                timings["step"] += t1 - t0 + t4 - t3
+                timings["buffer"] += t2 - t1
+                timings["action"] += t3 - t2
+
+        step_count = int(sum(steps * len(group) for steps, group in zip(group_steps, self._groups, strict=True)))
+        return obs, step_count // self.env_num
+
+    def _collect_ready_first(
+        self,
+        obs: np.ndarray,
+        n_step: int | None,
+        n_episode: int | None,
+        random: bool,
+        render: bool,
+        no_grad: bool,
+        episodes: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        timings: dict[str, float],
+    ) -> tuple[np.ndarray, int]:
+        """Acts on the first `ready_batch_size` envs to finish their step, so that slow envs do not hold back the others.
+
+        The fast envs make more steps than the slow ones, `n_step` bounds the number of env steps
+        divided by the number of envs. Returns the last observations and that number.
+        """
+        assert self.ready_batch_size is not None
+        obs = np.array(obs)
+        all_env_ids = np.arange(self.env_num)
+        t0 = time.perf_counter()
+        actions = np.array(self._get_actions(obs, random=random, no_grad=no_grad))
+        t1 = time.perf_counter()
+        self.env.step_async_ids(actions, all_env_ids)  # type: ignore[attr-defined]
+        timings["action"] += t1 - t0
+        timings["step"] += time.perf_counter() - t1
+
+        stepping = np.ones(self.env_num, dtype=np.bool_)
+        env_steps: int = 0
+        num_collected_episodes: int = 0
+        stopped = False
+
+        while True:
+            t0 = time.perf_counter()
+            if stopped:
+                # drain the envs still stepping, their transitions are kept
+                env_ids = np.flatnonzero(stepping)
+                if len(env_ids) == 0:
+                    break
+                result = self.env.step_wait_ids(env_ids)  # type: ignore[attr-defined]
+            else:
+                env_ids, result = self.env.step_wait_ready(self.ready_batch_size)  # type: ignore[attr-defined]
+            stepping[env_ids] = False
+            next_obs, rewards, terminated, truncated, info = result
+            t1 = time.perf_counter()
+            done = terminated | truncated
+
+            pixels = self._pop_frames(info, required=render)
+            transition = Transition(
+                obs[env_ids],
+                actions[env_ids],
+                rewards,
+                next_obs,
+                done,
+                terminated,
+                truncated,
+                info,
+                pixels if render else None,
+            )
+            self._add_to_buffer(transition, env_ids=env_ids)
+            t2 = time.perf_counter()
+
+            obs[env_ids] = next_obs
+            self._track_episodes(rewards, done, env_ids, episodes)
+            env_steps += len(env_ids)
+            num_collected_episodes += int(done.sum())
+
+            stopped = (n_step is not None and env_steps >= n_step * self.env_num) or (
+                n_episode is not None and num_collected_episodes >= n_episode
+            )
+            t3 = t4 = time.perf_counter()
+            if not stopped:
+                actions[env_ids] = self._get_actions(obs[env_ids], random=random, no_grad=no_grad, env_ids=env_ids)
+                t3 = time.perf_counter()
+                self.env.step_async_ids(actions[env_ids], env_ids)  # type: ignore[attr-defined]
+                stepping[env_ids] = True
+                t4 = time.perf_counter()
+
+            timings["step"] += t1 - t0 + t4 - t3
+            timings["buffer"] += t2 - t1
+            timings["action"] += t3 - t2
+
+        return obs, env_steps // self.env_num
+
+
+def _select_rows(value: Any, rows: np.ndarray) -> Any:
+    """Selects the rows of the envs flagged in `rows` in a field of a vector step, including info dicts."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return {key: _select_rows(item, rows) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return tuple(item for item, kept in zip(value, rows, strict=True) if kept)
+    value = np.asarray(value)
+    return value[rows] if value.ndim > 0 else value
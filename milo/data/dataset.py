@@ -0,0 +1,201 @@
+import json
+import os
+import queue
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from milo.data.batch import Batch
+from milo.data.buffer.base import FIELDS
+from milo.data.transition import Transition
+
+INDEX_FILE = "index.json"
+
+
+class DatasetWriter:
+    """Streams transitions to a directory of `.npz` shards of `shard_size` rows, described by `index.json`.
+
+    Transitions are vector steps pushed like in `ReplayBuffer.push`, each env step is a row
+    saved with its `env_id` so that the episodes of each env can be rebuilt. Only the pending
+    rows of the current shard are held in memory. The info is only stored when pushed as
+    structured arrays (see `extract_info`), the `info` dicts are dropped.
+    """
+
+    def __init__(self, path: str | Path, shard_size: int = 100_000, compress: bool = False) -> None:
+        if shard_size < 1:
+            raise ValueError(f"shard_size must be positive, but got {shard_size=}.")
+        self.path = Path(path)
+        if (self.path / INDEX_FILE).exists():
+            raise ValueError(f"A dataset already exists in {self.path}.")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.compress = compress
+
+        self._fields: dict[str, dict] = {}
+        self._shards: list[dict] = []
+        self._pending: dict[str, list[np.ndarray]] = {}
+        self._num_pending = 0
+        self._closed = False
+
+    def __len__(self) -> int:
+        """Returns the number of rows pushed, written or not."""
+        return sum(shard["num_rows"] for shard in self._shards) + self._num_pending
+
+    def push(self, transition: Transition, env_ids: np.ndarray | None = None) -> None:
+        """Appends one row per env listed in `env_ids` (all the rows of the transition by default)."""
+        if self._closed:
+            raise ValueError("Cannot push to a closed dataset.")
+        num_rows = len(np.atleast_1d(transition.reward))
+        env_ids = np.arange(num_rows) if env_ids is None else np.asarray(env_ids)
+
+        rows = {"env_id": env_ids.astype(np.int64)}
+        for key in FIELDS:
+            value = getattr(transition, key)
+            if (key == "info" and not isinstance(value, np.ndarray)) or (value is None and key not in self._fields):
+                continue
+            if value is None:
+                raise ValueError(f"Transition is missing the field '{key}' stored in the dataset.")
+            rows[key] = np.asarray(value)
+        if not self._fields:
+            self._fields = {
+                key: {"shape": list(value.shape[1:]), "dtype": np.lib.format.dtype_to_descr(value.dtype)}
+                for key, value in rows.items()
+            }
+        elif rows.keys() != self._fields.keys():
+            raise ValueError(
+                f"Transition has the fields {sorted(rows)}, but the dataset stores {sorted(self._fields)}.",
+            )
+
+        for key, value in rows.items():
+            self._pending.setdefault(key, []).append(value)
+        self._num_pending += len(env_ids)
+        while self._num_pending >= self.shard_size:
+            self._write_shard(self.shard_size)
+
+    def _write_shard(self, num_rows: int) -> None:
+        pending = {key: np.concatenate(values) for key, values in self._pending.items()}
+        name = f"shard_{len(self._shards):06d}.npz"
+        save = np.savez_compressed if self.compress else np.savez
+        save(self.path / name, **{key: value[:num_rows] for key, value in pending.items()})
+
+        self._pending = {key: [value[num_rows:]] for key, value in pending.items()}
+        self._num_pending -= num_rows
+        self._shards.append({"file": name, "num_rows": num_rows})
+        self._write_index()
+
+    def _write_index(self) -> None:
+        # the index is replaced atomically, readers never see a partially written one
+        index = {"fields": self._fields, "shards": self._shards, "num_rows": len(self) - self._num_pending}
+        tmp_path = self.path / f"{INDEX_FILE}.tmp"
+        tmp_path.write_text(json.dumps(index, indent=2))
+        os.replace(tmp_path, self.path / INDEX_FILE)
+
+    def flush(self) -> None:
+        """Writes the pending rows in a last, possibly smaller, shard."""
+        if self._num_pending > 0:
+            self._write_shard(self._num_pending)
+        elif not (self.path / INDEX_FILE).exists():
+            self._write_index()
+
+    def close(self) -> None:
+        if not self._closed:
+            self.flush()
+            self._closed = True
+
+    def __enter__(self) -> "DatasetWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"DatasetWriter(path={self.path}, shard_size={self.shard_size}, dataset length={self.__len__()})"
+
+
+class DatasetReader:
+    """Reads a dataset written by `DatasetWriter`, one shard at a time."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        index = json.loads((self.path / INDEX_FILE).read_text())
+        self.fields: dict[str, dict] = index["fields"]
+        self.shards: list[dict] = index["shards"]
+        self.num_rows: int = index["num_rows"]
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def load_shard(self, shard_id: int) -> dict[str, np.ndarray]:
+        """Loads all the fields of a shard in memory."""
+        with np.load(self.path / self.shards[shard_id]["file"]) as shard:
+            return {key: shard[key] for key in shard.files}
+
+    def iter_batches(
+        self,
+        batch_size: int,
+        shuffle: bool = False,
+        drop_last: bool = False,
+        prefetch: int = 2,
+        seed: int | None = None,
+    ) -> Iterator[Batch]:
+        """Yields batches of `batch_size` rows while the next `prefetch` shards are loaded in a background thread.
+
+        With `shuffle`, the order of the shards and of the rows within each shard are shuffled,
+        a batch only mixes the rows of consecutive shards.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, but got {batch_size=}.")
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be positive, but got {prefetch=}.")
+        rng = np.random.default_rng(seed)
+        shard_ids = rng.permutation(len(self.shards)) if shuffle else np.arange(len(self.shards))
+
+        shards: queue.Queue = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._load_shards, args=(shard_ids, shards, stop), daemon=True)
+        thread.start()
+
+        try:
+            rest: dict[str, np.ndarray] | None = None
+            while (shard := shards.get()) is not None:
+                if isinstance(shard, BaseException):
+                    raise shard
+                if shuffle:
+                    order = rng.permutation(len(shard["env_id"]))
+                    shard = {key: value[order] for key, value in shard.items()}
+                if rest is not None:
+                    shard = {key: np.concatenate([rest[key], value]) for key, value in shard.items()}
+
+                num_rows = len(shard["env_id"])
+                num_full = num_rows - num_rows % batch_size
+                for start in range(0, num_full, batch_size):
+                    yield Batch({key: value[start : start + batch_size] for key, value in shard.items()})
+                rest = {key: value[num_full:] for key, value in shard.items()}
+
+            if rest is not None and len(rest["env_id"]) > 0 and not drop_last:
+                yield Batch(rest)
+        finally:
+            # stops the loading thread when the generator is closed before the end
+            stop.set()
+            while thread.is_alive():
+                try:
+                    shards.get_nowait()
+                except queue.Empty:
+                    thread.join(timeout=0.01)
+
+    def _load_shards(self, shard_ids: np.ndarray, shards: queue.Queue, stop: threading.Event) -> None:
+        try:
+            for shard_id in shard_ids:
+                if stop.is_set():
+                    return
+                shards.put(self.load_shard(int(shard_id)))
+        except Exception as exc:
+            shards.put(exc)
+            return
+        shards.put(None)
+
+    def __repr__(self) -> str:
+        return f"DatasetReader(path={self.path}, shards={len(self.shards)}, dataset length={self.__len__()})"
@@ -0,0 +1,219 @@
+import contextlib
+import copy
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import Any
+
+import numpy as np
+import torch
+
+from milo.data.batch import Batch, TensorConverter
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.buffer.shared import SharedReplayBuffer
+
+
+class Prefetcher:
+    """Iterator over batches sampled from a replay buffer and converted to tensors ahead of time.
+
+    Up to `depth` batches are kept ready in a queue, filled by a background thread sampling
+    from the buffer with its own generator seeded by `seed`, so that the sequence of batches is
+    reproducible. With `use_process` (the default for a `SharedReplayBuffer`), the rows are
+    gathered by a worker process in shared memory, away from the GIL of the learner, and only
+    converted by the thread. The batches use `depth + 1` reusable slots: a batch is overwritten
+    once the next one is taken. Rows pushed while they are sampled may be read half updated.
+    Only the fields listed in `keys` (all the fields by default) are sampled. The buffer must
+    hold rows when the prefetcher is created.
+    """
+
+    def __init__(
+        self,
+        buffer: ReplayBuffer,
+        batch_size: int,
+        depth: int = 2,
+        device: str | torch.device = "cpu",
+        pin_memory: bool = False,
+        keys: list[str] | None = None,
+        exclude_keys: list[str] | None = None,
+        sample_kwargs: dict[str, Any] | None = None,
+        use_process: bool | None = None,
+        seed: int | None = None,
+    ) -> None:
+        if depth < 1:
+            raise ValueError(f"depth must be positive, but got {depth=}.")
+        if len(buffer) == 0:
+            raise ValueError("Cannot prefetch from an empty buffer, push rows before creating the prefetcher.")
+        if use_process is None:
+            use_process = isinstance(buffer, SharedReplayBuffer)
+        if use_process and (not isinstance(buffer, SharedReplayBuffer) or sample_kwargs):
+            raise ValueError("Prefetching in a process requires a SharedReplayBuffer and no sample_kwargs.")
+
+        self.buffer = buffer
+        self.batch_size = batch_size
+        self.depth = depth
+        # without keys, the fields of the buffer are looked up at each sample
+        self.keys = keys if keys is None else buffer._select_keys(keys)
+        self.exclude_keys = exclude_keys or ["info"]
+        self.sample_kwargs = sample_kwargs or {}
+        self.use_process = use_process
+
+        # each slot has its own tensors, kept until the slot is released
+        num_slots = depth + 1
+        self._converters = [TensorConverter(device, pin_memory, non_blocking=pin_memory) for _ in range(num_slots)]
+        self._ready: queue.Queue = queue.Queue()
+        self._held: int | None = None
+        self._closed = False
+
+        if use_process:
+            self._start_worker(buffer, num_slots, seed)  # type: ignore[arg-type]
+        else:
+            # a shallow copy shares the arrays and cursors of the buffer, with its own generator
+            self._sampler = copy.copy(buffer)
+            self._sampler._rng = np.random.default_rng(seed)
+            self._sampler._sample_out = {}
+            self._free: Any = queue.Queue()
+        for slot in range(num_slots):
+            self._free.put(slot)
+
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _start_worker(self, buffer: SharedReplayBuffer, num_slots: int, seed: int | None) -> None:
+        # only the sampled fields get slots, the fields of a shared buffer are all allocated at creation
+        keys = buffer._select_keys(self.keys)
+        fields = {key: field for key, field in buffer.schema.items() if key in keys}
+
+        # one block per field, holding the field of all the slots
+        self._blocks: dict[str, shared_memory.SharedMemory] = {}
+        self._slot_fields: dict[str, dict] = {}
+        for key, field in fields.items():
+            shape = (num_slots, self.batch_size, *field["shape"])
+            size = max(int(np.prod(shape)) * np.dtype(field["dtype"]).itemsize, 1)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            self._blocks[key] = block
+            self._slot_fields[key] = {"name": block.name, "shape": shape, "dtype": field["dtype"]}
+        self._slots = _map_slots(self._blocks, self._slot_fields)
+
+        context = multiprocessing.get_context()
+        self._free = context.Queue()
+        self._filled = context.Queue()
+        self._worker = context.Process(
+            target=_sample_worker,
+            args=(buffer.handle, self._slot_fields, self.batch_size, seed, self._free, self._filled),
+            daemon=True,
+        )
+        self._worker.start()
+
+    def _next_sample(self) -> tuple[int, Batch] | None:
+        """Returns the next sampled batch and its slot, or None once closed."""
+        if not self.use_process:
+            slot = self._free.get()
+            if slot is None:
+                return None
+            return slot, self._sampler.sample(self.batch_size, keys=self.keys, **self.sample_kwargs)
+
+        result = self._filled.get()
+        if isinstance(result, BaseException):
+            raise result
+        if result is None:
+            return None
+        return result, Batch({key: value[result] for key, value in self._slots.items()})
+
+    def _fill(self) -> None:
+        try:
+            while (sample := self._next_sample()) is not None:
+                slot, batch = sample
+                batch.to_torch(exclude_keys=self.exclude_keys, converter=self._converters[slot])
+                self._ready.put((slot, batch))
+        except Exception as exc:
+            self._ready.put((None, exc))
+
+    def __iter__(self) -> "Prefetcher":
+        return self
+
+    def __next__(self) -> Batch:
+        if self._closed:
+            raise StopIteration
+        if self._held is not None:
+            self._free.put(self._held)
+            self._held = None
+
+        slot, batch = self._ready.get()
+        if isinstance(batch, BaseException):
+            # the thread has stopped, the next calls raise the same error
+            self._ready.put((slot, batch))
+            raise batch
+        self._held = slot
+        return batch
+
+    def close(self) -> None:
+        """Stops the background thread and worker process."""
+        if self._closed:
+            return
+        self._closed = True
+        self._free.put(None)
+        if self.use_process:
+            self._worker.join()
+            self._free.close()
+            self._filled.close()
+        self._thread.join()
+        if self.use_process:
+            self._held = None
+            while not self._ready.empty():
+                self._ready.get()
+            self._slots.clear()
+            for block in self._blocks.values():
+                block.unlink()
+                # batches still referenced on CPU keep the memory of their slot mapped
+                with contextlib.suppress(BufferError):
+                    block.close()
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"Prefetcher(buffer={self.buffer}, batch_size={self.batch_size}, depth={self.depth})"
+
+
+def _map_slots(blocks: dict[str, shared_memory.SharedMemory], slot_fields: dict[str, dict]) -> dict[str, np.ndarray]:
+    return {
+        key: np.ndarray(field["shape"], dtype=field["dtype"], buffer=blocks[key].buf)
+        for key, field in slot_fields.items()
+    }
+
+
+def _sample_worker(
+    handle: dict[str, Any],
+    slot_fields: dict[str, dict],
+    batch_size: int,
+    seed: int | None,
+    requests: multiprocessing.Queue,
+    filled: multiprocessing.Queue,
+) -> None:
+    """Gathers a batch in each slot received in `requests`, and sends the slot back in `filled`."""
+    buffer = SharedReplayBuffer.attach(handle, env_ids=np.array([], dtype=np.int64), seed=seed)
+    blocks = {key: shared_memory.SharedMemory(name=field["name"]) for key, field in slot_fields.items()}
+    slots = _map_slots(blocks, slot_fields)
+    try:
+        while (slot := requests.get()) is not None:
+            if len(buffer) == 0:
+                raise ValueError("Cannot sample from an empty buffer.")
+            env_ids, time_ids = buffer._sample_ids(batch_size)
+            for key, value in slots.items():
+                if key == "env_id":
+                    value[slot] = env_ids
+                else:
+                    buffer._gather_field(key, env_ids, time_ids, value[slot])
+            filled.put(slot)
+        filled.put(None)
+    except Exception as exc:
+        filled.put(exc)
+    finally:
+        slots.clear()
+        for block in blocks.values():
+            block.close()
+        buffer.close()
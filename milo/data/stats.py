@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class CollectStats:
+    """Statistics of one `Collector.collect` call.
+
+    `episode_returns`, `episode_lengths` and `episode_env_ids` describe the episodes that ended
+    during the call, in the order they ended. `timings` holds the seconds spent in each stage of
+    the collection loop, to find which one limits the throughput.
+    """
+
+    def __init__(
+        self,
+        n_collected_steps: int,
+        n_collected_episodes: int,
+        collect_time: float,
+        episode_returns: np.ndarray,
+        episode_lengths: np.ndarray,
+        episode_env_ids: np.ndarray,
+        timings: dict[str, float],
+        num_envs: int = 1,
+    ) -> None:
+        self.n_collected_steps = n_collected_steps
+        self.n_collected_episodes = n_collected_episodes
+        self.collect_time = collect_time
+        self.episode_returns = episode_returns
+        self.episode_lengths = episode_lengths
+        self.episode_env_ids = episode_env_ids
+        self.timings = timings
+        self.num_envs = num_envs
+
+    @property
+    def steps_per_second(self) -> float:
+        """Returns the number of env steps (vector steps times envs) per second."""
+        return self.n_collected_steps * self.num_envs / self.collect_time
+
+    @property
+    def episodes_per_second(self) -> float:
+        return self.n_collected_episodes / self.collect_time
+
+    @property
+    def returns_mean(self) -> float:
+        return float(np.mean(self.episode_returns)) if len(self.episode_returns) > 0 else float("nan")
+
+    @property
+    def lengths_mean(self) -> float:
+        return float(np.mean(self.episode_lengths)) if len(self.episode_lengths) > 0 else float("nan")
+
+    @property
+    def timing_fractions(self) -> dict[str, float]:
+        """Returns the share of the collection time spent in each stage."""
+        return {stage: duration / self.collect_time for stage, duration in self.timings.items()}
+
+    def __repr__(self) -> str:
+        timings = ", ".join(f"{stage}={duration:.3f}s" for stage, duration in self.timings.items())
+        return (
+            f"CollectStats(steps={self.n_collected_steps}, episodes={self.n_collected_episodes}, "
+            f"time={self.collect_time:.3f}s, steps/s={self.steps_per_second:.1f}, "
+            f"episodes/s={self.episodes_per_second:.2f}, return={self.returns_mean:.3f}, "
+            f"length={self.lengths_mean:.1f}, {timings})"
+        )
@@ -1,7 +1,12 @@
+from typing import Any
+
 import numpy as np
 
 
 class Transition:
+    # a fixed layout without per-instance `__dict__`, one transition holds a whole vector step
+    __slots__ = ("obs", "action", "reward", "next_obs", "done", "terminated", "truncated", "info", "pixels")
+
     def __init__(
         self,
         obs: np.ndarray,
@@ -11,7 +16,7 @@ class Transition:
         done: np.ndarray,
         terminated: np.ndarray | None = None,
         truncated: np.ndarray | None = None,
-        info: dict | None = None,
+        info: dict | np.ndarray | None = None,
         pixels: tuple | np.ndarray | None = None,
     ) -> None:
         self.obs = obs
@@ -31,3 +36,22 @@ class Transition:
             f"done={self.done}, terminated={self.terminated}, "
             f"truncated={self.truncated})"
         )
+
+
+def info_dtype(schema: dict[str, Any]) -> np.dtype:
+    """Returns the structured dtype of the info keys of `schema`, mapping each key to a dtype or `(dtype, shape)`."""
+    return np.dtype(list(schema.items()))
+
+
+def extract_info(info: dict, schema: dict[str, Any], num_envs: int) -> np.ndarray:
+    """Gathers the `schema` keys of a vectorized info dict in a structured array with one row per env.
+
+    The other keys are dropped, and the envs without a key (see the `_key` masks) get zeros.
+    """
+    rows = np.zeros(num_envs, dtype=info_dtype(schema))
+    for key in schema:
+        if key not in info:
+            continue
+        mask = info.get(f"_{key}", np.ones(num_envs, dtype=np.bool_))
+        rows[key][mask] = np.asarray(info[key])[mask]
+    return rows
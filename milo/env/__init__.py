@@ -1,10 +1,19 @@
 import importlib
+import importlib.metadata
+import json
 import os
+import re
 from collections.abc import Callable, Sequence
+from functools import lru_cache, partial
+from pathlib import Path
 from typing import Any
 
 import gymnasium as gym
 from gymnasium import Env, Wrapper
+from gymnasium.spaces import Box
+
+from milo.env.utils import gym_vector_env_creator
+from milo.env.wrappers import ActionRepeat, PadTask, common_padded_spaces
 
 
 def make_env(
@@ -15,12 +24,15 @@ def make_env(
     env_spec_kwargs: dict[str, Any] | None = None,
     vector_kwargs: dict[str, Any] | None = None,
     wrappers: Sequence[Callable[[Env], Wrapper]] | None = None,
+    action_repeat: int = 1,
 ) -> gym.vector.VectorEnv:
     """Creates a vectorized environment based on the provided parameters."""
     env_spec_kwargs = env_spec_kwargs or {}
     vector_kwargs = vector_kwargs or {}
     wrappers = wrappers or []
 
+    wrappers = _with_action_repeat(wrappers, action_repeat)
+
     # f simulator is not provided, attempt to detect simulator automatically
     if simulator is None:
         simulator = find_simulator(env_id)
@@ -45,36 +57,151 @@ def make_env(
         raise ValueError(f"Cannot create environment {env_id} because simulator {simulator} is not supported.") from exc
 
 
-def find_simulator(env_id: str) -> str | None:
-    """Checks for the existence of an environment ID in various simulation libraries and returns the name of the library if the ID is found. If the ID is not found in any of the libraries, it returns None."""
-    # gymnasium
-    try:
-        import gymnasium as gym
+def make_multi_task_env(
+    env_ids: Sequence[tuple[str, int]],
+    vectorization_mode: str = "async",
+    env_spec_kwargs: dict[str, dict[str, Any]] | None = None,
+    vector_kwargs: dict[str, Any] | None = None,
+    wrappers: Sequence[Callable[[Env], Wrapper]] | None = None,
+    action_repeat: int = 1,
+) -> gym.vector.VectorEnv:
+    """Creates a single vectorized environment running `count` envs for each `(env_id, count)`, possibly of different simulators.
 
-        if env_id in gym.envs.registry:
-            return "gymnasium"
-    except ModuleNotFoundError:
-        pass
+    The observations and actions of all the tasks are padded to common spaces (see `PadTask`),
+    and the task id of each env, the position of its env ID in `env_ids`, is returned in
+    `info["task_id"]`. The environment specific arguments are given per env ID.
+    """
+    env_spec_kwargs = env_spec_kwargs or {}
+    vector_kwargs = vector_kwargs or {}
+    wrappers = _with_action_repeat(wrappers or [], action_repeat)
 
-    # metaworld
-    try:
+    task_env_fns = []
+    for env_id, count in env_ids:
+        if count < 1:
+            raise ValueError(f"The number of envs of each task must be positive, but got {count} for {env_id}.")
+        simulator = find_simulator(env_id)
+        if simulator is None:
+            raise ValueError(f"Cannot create environment {env_id} because we couldn't find a simulator to use.")
+        make_env_fns = importlib.import_module(f"milo.env.{simulator}").make_env_fns
+        task_env_fns.append(make_env_fns(env_id, count, dict(env_spec_kwargs.get(env_id, {})), wrappers))
+
+    # one env of each task is created to read its spaces
+    spaces = []
+    for (env_id, _), env_fns in zip(env_ids, task_env_fns, strict=True):
+        env = env_fns[0]()
+        if not isinstance(env.observation_space, Box) or not isinstance(env.action_space, Box):
+            raise ValueError(f"Cannot mix environment {env_id} with other tasks, its spaces are not Box spaces.")
+        spaces.append((env.observation_space, env.action_space))
+        env.close()
+    observation_space, action_space = common_padded_spaces(spaces)
+
+    padded_env_fns = [
+        partial(_make_padded_env, env_fn, observation_space, action_space, task_id)
+        for task_id, env_fns in enumerate(task_env_fns)
+        for env_fn in env_fns
+    ]
+    return gym_vector_env_creator(padded_env_fns, vectorization_mode, vector_kwargs=vector_kwargs)
+
+
+def _make_padded_env(env_fn: Callable[[], Env], observation_space: Box, action_space: Box, task_id: int) -> Env:
+    return PadTask(env_fn(), observation_space, action_space, task_id)
+
+
+def _with_action_repeat(
+    wrappers: Sequence[Callable[[Env], Wrapper]],
+    action_repeat: int,
+) -> Sequence[Callable[[Env], Wrapper]]:
+    # the actions are repeated in the workers, before any other wrapper
+    if action_repeat < 1:
+        raise ValueError(f"action_repeat must be positive, but got {action_repeat=}.")
+    if action_repeat > 1:
+        return [partial(ActionRepeat, repeat=action_repeat), *wrappers]
+    return wrappers
+
+
+# ids each simulator may provide, only the simulators whose pattern matches are imported to look up an id
+SIMULATOR_PATTERNS = {
+    "metaworld": re.compile(r"^(ML10|ML45|MT10|MT50|[a-z0-9]+(-[a-z0-9]+)*-v\d+(-goal-(observable|hidden))?)$"),
+    "dmc": re.compile(r"^\w+-(?!v\d+$)\w+$"),
+}
+SIMULATOR_DISTRIBUTIONS = {"metaworld": "metaworld", "dmc": "dm_control"}
+# optional json file keeping the ids of the simulators between runs, to skip their imports
+ENV_ID_CACHE_VARIABLE = "MILO_ENV_ID_CACHE"
+
+
+def _import_env_ids(simulator: str) -> list[str]:
+    if simulator == "metaworld":
         from metaworld.envs.mujoco.env_dict import ALL_V2_ENVIRONMENTS
 
-        if env_id in ALL_V2_ENVIRONMENTS:
-            return "metaworld"
-    except ModuleNotFoundError:
-        pass
+        # the env names and the multi-task benchmarks
+        return [*ALL_V2_ENVIRONMENTS, "ML10", "ML45", "MT10", "MT50"]
+
+    # dmc with headless rendering to avoid warning, unless a backend was chosen
+    os.environ.setdefault("MUJOCO_GL", "osmesa")
+    from dm_control.suite import ALL_TASKS
+
+    return ["-".join(task) for task in ALL_TASKS]
+
+
+def _read_env_id_cache(cache_path: Path) -> dict[str, Any]:
+    # a missing or unreadable cache is a cache miss
+    try:
+        cache = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _write_env_id_cache(cache_path: Path, cache: dict[str, Any]) -> None:
+    # the cache is replaced atomically, concurrent readers never see a partially written one
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(cache))
+    os.replace(tmp_path, cache_path)
 
-    # dmc
+
+@lru_cache
+def _known_env_ids(simulator: str) -> frozenset[str]:
+    """Returns the ids provided by an installed simulator, read from the on-disk cache when possible.
+
+    Simulators importable without package metadata (e.g. a source checkout) are imported, uncached.
+    """
     try:
-        # dmc with headless rendering to avoid warning
-        os.environ["MUJOCO_GL"] = "osmesa"
-        from dm_control.suite import ALL_TASKS
+        version: str | None = importlib.metadata.version(SIMULATOR_DISTRIBUTIONS[simulator])
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+
+    cache_path = os.environ.get(ENV_ID_CACHE_VARIABLE) if version is not None else None
+    cache: dict[str, Any] = {}
+    if cache_path is not None:
+        cache = _read_env_id_cache(Path(cache_path))
+        entry = cache.get(simulator)
+        if isinstance(entry, dict) and entry.get("version") == version and isinstance(entry.get("env_ids"), list):
+            return frozenset(entry["env_ids"])
 
-        all_tasks = ["-".join(task) for task in ALL_TASKS]
-        if env_id in all_tasks:
-            return "dmc"
+    try:
+        env_ids = _import_env_ids(simulator)
     except ModuleNotFoundError:
-        pass
+        return frozenset()
+
+    if cache_path is not None:
+        cache[simulator] = {"version": version, "env_ids": env_ids}
+        _write_env_id_cache(Path(cache_path), cache)
+    return frozenset(env_ids)
+
+
+def find_simulator(env_id: str) -> str | None:
+    """Checks for the existence of an environment ID in various simulation libraries and returns the name of the library if the ID is found. If the ID is not found in any of the libraries, it returns None.
+
+    The gymnasium registry is checked first, then only the simulators whose id pattern matches are
+    imported, once per process (or once per version with the on-disk cache set by `MILO_ENV_ID_CACHE`).
+    """
+    # gymnasium, ids can be registered at any time
+    if env_id in gym.envs.registry:
+        return "gymnasium"
+
+    for simulator, pattern in SIMULATOR_PATTERNS.items():
+        if pattern.match(env_id) and env_id in _known_env_ids(simulator):
+            return simulator
 
     return None
@@ -4,7 +4,7 @@ import logging
 import os
 from collections import OrderedDict
 from collections.abc import Callable, Sequence
-from typing import Any
+from typing import Any, Literal
 
 import gymnasium as gym
 import numpy as np
@@ -12,9 +12,9 @@ from dm_control import suite
 from dm_env import specs
 from gymnasium import Env, Wrapper
 from gymnasium.core import RenderFrame
-from gymnasium.spaces import Box
+from gymnasium.spaces import Box, Dict, Space
 
-from milo.env.utils import gym_vector_env_creator
+from milo.env.utils import apply_wrappers, gym_vector_env_creator
 
 
 def make(
@@ -30,11 +30,22 @@ def make(
     vector_kwargs = vector_kwargs or {}
     wrappers = wrappers or []
 
-    domain, task = env_id.split("-")
+    env_fns = make_env_fns(env_id, num_envs, env_spec_kwargs, wrappers)
+
+    return gym_vector_env_creator(env_fns, vectorization_mode, vector_kwargs=vector_kwargs)
 
-    env_fns = [lambda: DMC2Gym(domain=domain, task=task, **env_spec_kwargs) for _ in range(num_envs)]
 
-    return gym_vector_env_creator(env_fns, vectorization_mode, **vector_kwargs)
+def make_env_fns(
+    env_id: str,
+    num_envs: int,
+    env_spec_kwargs: dict[str, Any],
+    wrappers: Sequence[Callable[[Env], Wrapper]],
+) -> list[Callable[[], Env]]:
+    """Returns the functions creating each of the wrapped envs."""
+    domain, task = env_id.split("-")
+    return [
+        lambda: apply_wrappers(DMC2Gym(domain=domain, task=task, **env_spec_kwargs), wrappers) for _ in range(num_envs)
+    ]
 
 
 def _spec_to_box(spec: OrderedDict | list, dtype: type = np.float32) -> Box:
@@ -65,14 +76,24 @@ def _spec_to_box(spec: OrderedDict | list, dtype: type = np.float32) -> Box:
     return Box(low, high, dtype=dtype)
 
 
-def _flatten_obs(obs: dict[str, np.ndarray | float | int], dtype: type = np.float32) -> np.ndarray:
-    """A function that flattens a dictionary of numpy arrays, floats, or integers into a single numpy array."""
-    obs_pieces = [v.ravel() if isinstance(v, np.ndarray) else np.array([v]) for v in obs.values()]
-    return np.concatenate(obs_pieces, axis=0).astype(dtype)
+def _spec_to_dict(spec: OrderedDict) -> Dict:
+    """Converts an observation specification to a gym Dict space, keeping the shape of each value."""
+    spaces: dict[str, Space] = {}
+    for key, value in spec.items():
+        box = _spec_to_box([value])
+        shape = value.shape or (1,)
+        spaces[key] = Box(box.low.reshape(shape), box.high.reshape(shape), dtype=np.float32)
+    return Dict(spaces)
 
 
 class DMC2Gym(Env):
-    """Converts a dmc environment to a gym compatible environment."""
+    """Converts a dmc environment to a gym compatible environment.
+
+    The observations are written in float32 buffers laid out once from the observation spec, flat
+    by default or as a dict of arrays with `flatten_obs=False`. With `copy_obs=False` the buffers
+    themselves are returned and overwritten by the next step or reset, which suits vector env
+    workers copying the observations anyway.
+    """
 
     def __init__(
         self,
@@ -85,10 +106,16 @@ class DMC2Gym(Env):
         render_height: int = 480,
         render_width: int = 480,
         render_camera_id: int = 0,
+        flatten_obs: bool = True,
+        copy_obs: bool = True,
+        action_check: Literal["strict", "clip", "off"] = "strict",
     ):
         environment_kwargs = environment_kwargs or {}
         task_kwargs = task_kwargs or {}
 
+        if action_check not in ["strict", "clip", "off"]:
+            raise ValueError(f"Invalid action_check {action_check}, must be one of 'strict', 'clip' or 'off'.")
+
         # TODO: this seems to be present before importing dm_control suite to avoid warning
         # for details see https://github.com/deepmind/dm_control
         assert rendering in ["glfw", "egl", "osmesa"]
@@ -107,8 +134,33 @@ class DMC2Gym(Env):
         self.render_width = render_width
         self.render_camera_id = render_camera_id
 
-        self._observation_space = _spec_to_box(self._env.observation_spec().values())
+        observation_spec = self._env.observation_spec()
         self._action_space = _spec_to_box([self._env.action_spec()])
+        self.action_check = action_check
+        # clipped actions are written in a reused buffer, leaving the caller's array untouched
+        self._action_buffer = np.zeros(self._action_space.shape, dtype=np.float32)
+        self.flatten_obs = flatten_obs
+        self.copy_obs = copy_obs
+        self._observation_space: Box | Dict
+        self._obs_buffer: np.ndarray | dict[str, np.ndarray]
+        if flatten_obs:
+            self._observation_space = _spec_to_box(observation_spec.values())
+            self._obs_buffer = np.zeros(self._observation_space.shape, dtype=np.float32)
+            # one view of the flat buffer per key, in the order of the spec
+            self._obs_views = []
+            start = 0
+            for key, value in observation_spec.items():
+                size = int(np.prod(value.shape))
+                self._obs_views.append((key, self._obs_buffer[start : start + size].reshape(value.shape)))
+                start += size
+        else:
+            self._observation_space = _spec_to_dict(observation_spec)
+            self._obs_buffer = {
+                key: np.zeros(value.shape or (1,), dtype=np.float32) for key, value in observation_spec.items()
+            }
+            self._obs_views = [
+                (key, buffer.reshape(observation_spec[key].shape)) for key, buffer in self._obs_buffer.items()
+            ]
 
         # set seed if provided with task_kwargs
         if "random" in task_kwargs:
@@ -120,7 +172,7 @@ class DMC2Gym(Env):
         return getattr(self._env, name)
 
     @property
-    def observation_space(self) -> Box:  # type: ignore
+    def observation_space(self) -> Box | Dict:  # type: ignore
         return self._observation_space
 
     @property
@@ -131,13 +183,36 @@ class DMC2Gym(Env):
     def reward_range(self) -> tuple:
         return 0, 1
 
-    def step(self, action: np.ndarray) -> tuple[np.ndarray, float, bool, bool, dict[str, Any]]:
-        """Executes a step in the environment."""
-        if action.dtype.kind == "f":
-            action = action.astype(np.float32)
-        assert self._action_space.contains(action)
+    def _convert_obs(self, observation: OrderedDict) -> np.ndarray | dict[str, np.ndarray]:
+        """Writes a dmc observation in the observation buffers, casting to float32 in place."""
+        for key, view in self._obs_views:
+            view[...] = observation[key]
+        if not self.copy_obs:
+            return self._obs_buffer
+        if isinstance(self._obs_buffer, dict):
+            return {key: buffer.copy() for key, buffer in self._obs_buffer.items()}
+        return self._obs_buffer.copy()
+
+    def step(self, action: np.ndarray) -> tuple[Any, float, bool, bool, dict[str, Any]]:
+        """Executes a step in the environment, checking the action as set by `action_check`.
+
+        With "strict" an action out of the action space fails an assertion, with "clip" it is
+        clipped to the bounds, and with "off" it is passed as is to dm_control.
+        """
+        if self.action_check == "strict":
+            if action.dtype.kind == "f":
+                action = action.astype(np.float32)
+            assert self._action_space.contains(action)
+        elif self.action_check == "clip":
+            self._action_buffer[...] = action
+            action = np.clip(
+                self._action_buffer,
+                self._action_space.low,
+                self._action_space.high,
+                out=self._action_buffer,
+            )
         timestep = self._env.step(action)
-        observation = _flatten_obs(timestep.observation)
+        observation = self._convert_obs(timestep.observation)
         reward = timestep.reward
         termination = False  # we never reach a goal
         truncation = timestep.last()
@@ -148,7 +223,7 @@ class DMC2Gym(Env):
         self,
         seed: int | np.random.RandomState | None = None,
         options: dict | None = None,
-    ) -> tuple[np.ndarray, dict[str, Any]]:
+    ) -> tuple[Any, dict[str, Any]]:
         """Resets the environment to its initial state depending on the seed and options."""
         if options:
             logging.warning(f"Currently doing nothing with options={options}")
@@ -164,7 +239,7 @@ class DMC2Gym(Env):
             self._env.task._random = seed
 
         timestep = self._env.reset()
-        observation = _flatten_obs(timestep.observation)
+        observation = self._convert_obs(timestep.observation)
         info: dict[str, Any] = {}
         return observation, info
 
@@ -175,7 +250,7 @@ class DMC2Gym(Env):
         camera_id: int | None = None,
     ) -> RenderFrame | list[RenderFrame] | None:
         """Renders the current state of the environment."""
-        height = height or self.render_height
-        width = width or self.render_width
-        camera_id = camera_id or self.render_camera_id
+        height = self.render_height if height is None else height
+        width = self.render_width if width is None else width
+        camera_id = self.render_camera_id if camera_id is None else camera_id
         return self._env.physics.render(height=height, width=width, camera_id=camera_id)
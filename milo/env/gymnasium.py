@@ -4,6 +4,8 @@ from typing import Any
 import gymnasium as gym
 from gymnasium import Env, Wrapper
 
+from milo.env.utils import apply_wrappers, gym_vector_env_creator
+
 
 def make(
     env_id: str,
@@ -18,15 +20,19 @@ def make(
     vector_kwargs = vector_kwargs or {}
     wrappers = wrappers or []
 
+    # milo's vector envs, which can step subsets of their envs
+    env_fns = make_env_fns(env_id, num_envs, env_spec_kwargs, wrappers)
+
+    return gym_vector_env_creator(env_fns, vectorization_mode, vector_kwargs=vector_kwargs)
+
+
+def make_env_fns(
+    env_id: str,
+    num_envs: int,
+    env_spec_kwargs: dict[str, Any],
+    wrappers: Sequence[Callable[[Env], Wrapper]],
+) -> list[Callable[[], Env]]:
+    """Returns the functions creating each of the wrapped envs."""
     # Set default render mode
-    if "render_mode" not in env_spec_kwargs:
-        env_spec_kwargs["render_mode"] = "rgb_array"
-
-    return gym.make_vec(
-        env_id,
-        num_envs=num_envs,
-        vectorization_mode=vectorization_mode,
-        vector_kwargs=vector_kwargs,
-        wrappers=wrappers,
-        **env_spec_kwargs,
-    )
+    env_spec_kwargs = {"render_mode": "rgb_array", **env_spec_kwargs}
+    return [lambda: apply_wrappers(gym.make(env_id, **env_spec_kwargs), wrappers) for _ in range(num_envs)]
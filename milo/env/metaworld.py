@@ -1,12 +1,59 @@
 import random
+from collections import defaultdict
 from collections.abc import Callable, Sequence
+from functools import lru_cache, partial
 from typing import Any
 
 import gymnasium as gym
 import metaworld
 from gymnasium import Env, Wrapper
 
-from milo.env.utils import gym_vector_env_creator
+from milo.env.utils import apply_wrappers, gym_vector_env_creator
+
+# multi-task benchmarks, any other id is the env name of an ML1 benchmark
+BENCHMARKS = {"ML10": metaworld.ML10, "ML45": metaworld.ML45, "MT10": metaworld.MT10, "MT50": metaworld.MT50}
+
+
+@lru_cache
+def get_benchmark(env_id: str, seed: int | None = None) -> metaworld.Benchmark:
+    """Returns the benchmark providing `env_id`, built once per process and seed."""
+    if env_id in BENCHMARKS:
+        return BENCHMARKS[env_id](seed=seed)
+    return metaworld.ML1(env_id, seed=seed)
+
+
+def sample_tasks(env_id: str, num_envs: int, seed: int | None = None) -> list[tuple[type, metaworld.Task]]:
+    """Returns the env class and a train task for each env, the env names of the benchmark taking turns.
+
+    The tasks are drawn with a generator seeded by `seed`, or with the global `random` module (see
+    `random.seed`) without seed.
+    """
+    benchmark = get_benchmark(env_id, seed)
+    names = list(benchmark.train_classes)
+    tasks = defaultdict(list)
+    for task in benchmark.train_tasks:
+        tasks[task.env_name].append(task)
+
+    rng: Any = random if seed is None else random.Random(seed)
+    env_names = [names[i % len(names)] for i in range(num_envs)]
+    sampled = {}
+    for name in names:
+        count = env_names.count(name)
+        assert count <= len(tasks[name]), f"Cannot sample {count} different tasks out of {len(tasks[name])} for {name}."
+        sampled[name] = rng.sample(tasks[name], count)
+    return [(benchmark.train_classes[name], sampled[name].pop()) for name in env_names]
+
+
+def _make_task_env(
+    env_cls: type,
+    task: metaworld.Task,
+    render_mode: str,
+    env_spec_kwargs: dict[str, Any],
+    wrappers: Sequence[Callable[[Env], Wrapper]],
+) -> Env:
+    env = env_cls(render_mode=render_mode, **env_spec_kwargs)
+    env.set_task(task)
+    return apply_wrappers(env, wrappers)
 
 
 def make(
@@ -17,21 +64,33 @@ def make(
     vector_kwargs: dict[str, Any] | None = None,
     wrappers: Sequence[Callable[[Env], Wrapper]] | None = None,
 ) -> gym.vector.VectorEnv:
-    """Creates a metaworld vectorized environment based on the given environment ID, number of environments, vectorization mode, environment specific arguments, vector arguments, and wrappers."""
+    """Creates a metaworld vectorized environment based on the given environment ID, number of environments, vectorization mode, environment specific arguments, vector arguments, and wrappers.
+
+    The ID is either an env name (ML1) or one of the multi-task benchmarks ML10, ML45, MT10 and MT50,
+    whose env names are spread over the envs. The benchmarks are built once per process, and the
+    workers only receive their env class and task. The `benchmark_seed` entry of `env_spec_kwargs`
+    seeds the benchmark and the sampling of the tasks, which otherwise follows `random.seed`.
+    """
     env_spec_kwargs = env_spec_kwargs or {}
     vector_kwargs = vector_kwargs or {}
     wrappers = wrappers or []
-    render_mode = env_spec_kwargs.pop("render_mode", "rgb_array")
 
-    ml1 = metaworld.ML1(env_id)
-    env_fns = [lambda: ml1.train_classes[env_id](render_mode=render_mode, **env_spec_kwargs) for _ in range(num_envs)]
+    env_fns = make_env_fns(env_id, num_envs, env_spec_kwargs, wrappers)
 
-    envs = gym_vector_env_creator(env_fns, vectorization_mode, vector_kwargs=vector_kwargs)
+    return gym_vector_env_creator(env_fns, vectorization_mode, vector_kwargs=vector_kwargs)
 
-    # Randomly sample tasks, assumes num_env <= len(train_tasks)
-    assert num_envs <= len(ml1.train_tasks), "num_envs must be <= len(train_tasks)"
 
-    tasks = random.sample(ml1.train_tasks, num_envs)
-    envs.call_ids("set_task", [{"args": [task]} for task in tasks])
-
-    return envs
+def make_env_fns(
+    env_id: str,
+    num_envs: int,
+    env_spec_kwargs: dict[str, Any],
+    wrappers: Sequence[Callable[[Env], Wrapper]],
+) -> list[Callable[[], Env]]:
+    """Returns the functions creating each of the wrapped envs."""
+    env_spec_kwargs = dict(env_spec_kwargs)
+    render_mode = env_spec_kwargs.pop("render_mode", "rgb_array")
+    seed = env_spec_kwargs.pop("benchmark_seed", None)
+    return [
+        partial(_make_task_env, env_cls, task, render_mode, env_spec_kwargs, wrappers)
+        for env_cls, task in sample_tasks(env_id, num_envs, seed)
+    ]
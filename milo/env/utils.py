@@ -1,12 +1,38 @@
+import multiprocessing
+import sys
+import time
+from collections.abc import Callable, Sequence
+from multiprocessing.connection import Connection, wait
 from typing import Any
 
-from gymnasium.error import AlreadyPendingCallError
+import numpy as np
+from gymnasium import Env, Wrapper
+from gymnasium.error import AlreadyPendingCallError, NoAsyncCallError
 from gymnasium.vector.async_vector_env import AsyncState
 from gymnasium.vector.async_vector_env import AsyncVectorEnv as OriginalAsyncVectorEnv
 from gymnasium.vector.sync_vector_env import SyncVectorEnv as OriginalSyncVectorEnv
+from gymnasium.vector.utils import (
+    CloudpickleWrapper,
+    concatenate,
+    create_empty_array,
+    write_to_shared_memory,
+)
 
 
 class SyncVectorEnv(OriginalSyncVectorEnv):
+    def reconfigure_ids(self, env_fns: Sequence[Callable[[], Env]], env_ids: Sequence[int] | None = None) -> None:
+        """Replaces the envs of `env_ids` (all by default) by new envs with the same spaces, to be reset before stepping."""
+        env_ids = list(range(self.num_envs)) if env_ids is None else list(env_ids)
+        assert len(env_fns) == len(env_ids), "number of env_fns must match number of env_ids"
+        for env_id, env_fn in zip(env_ids, env_fns, strict=True):
+            env = env_fn()
+            if env.observation_space != self.single_observation_space or env.action_space != self.single_action_space:
+                env.close()
+                raise ValueError(f"The new env {env_id} must have the spaces of the vector env.")
+            self.envs[env_id].close()
+            self.envs[env_id] = env
+            self._autoreset_envs[env_id] = False
+
     def call_ids(self, name: str, args_ids: list) -> tuple[Any, ...]:
         """Synchronously calls a method by name on all environments and returns the results."""
         assert len(args_ids) == len(self.envs), "number of args_ids must match number of envs"
@@ -27,7 +53,187 @@ class SyncVectorEnv(OriginalSyncVectorEnv):
         return tuple(results)
 
 
+def _take(value: Any, env_ids: np.ndarray) -> Any:
+    """Selects the rows of `env_ids` in batched observations or vectorized info dicts."""
+    if isinstance(value, dict):
+        return {key: _take(item, env_ids) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_take(item, env_ids) for item in value)
+    return value[env_ids]
+
+
 class AsyncVectorEnv(OriginalAsyncVectorEnv):
+    """Async vector env whose workers can also be stepped in subsets with `step_async_ids` and `step_wait_ids`.
+
+    Several subsets can be in flight at the same time, so that some workers step while the results
+    of the others are processed. `step_wait_ready` returns the results of the first workers to
+    finish (as envpool does), so that slow steps or resets do not hold back the other envs.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("worker", _async_worker)
+        super().__init__(*args, **kwargs)
+        self._stepping = np.zeros(self.num_envs, dtype=np.bool_)
+
+    @property
+    def stepping_ids(self) -> np.ndarray:
+        """Returns the ids of the envs whose step sent by `step_async_ids` is pending."""
+        return np.flatnonzero(self._stepping)
+
+    def step_async_ids(self, actions: np.ndarray, env_ids: np.ndarray) -> None:
+        """Sends the actions of a batch of `len(env_ids)` envs to their workers."""
+        self._assert_is_running()
+        env_ids = np.asarray(env_ids)
+        # a step of all the envs sent by `step_async` leaves `_stepping` unset
+        pending_full_step = self._state == AsyncState.WAITING_STEP and not self._stepping.any()
+        if (
+            self._state not in (AsyncState.DEFAULT, AsyncState.WAITING_STEP)
+            or pending_full_step
+            or self._stepping[env_ids].any()
+        ):
+            raise AlreadyPendingCallError(
+                f"Calling `step_async_ids` while waiting for a pending call to `{self._state.value}` to complete.",
+                str(self._state.value),
+            )
+
+        for env_id, action in zip(env_ids, actions, strict=True):
+            self.parent_pipes[env_id].send(("step", action))
+        self._stepping[env_ids] = True
+        self._state = AsyncState.WAITING_STEP
+
+    def step_wait(
+        self,
+        timeout: int | float | None = None,
+    ) -> tuple[Any, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Waits for the steps sent to all the envs by `step_async`."""
+        # the workers not stepped by `step_async_ids` would never answer
+        if self._stepping.any():
+            raise NoAsyncCallError(
+                "Calling `step_wait` while the steps sent by `step_async_ids` are pending, use `step_wait_ids`.",
+                AsyncState.WAITING_STEP.value,
+            )
+        return super().step_wait(timeout)
+
+    def step_wait_ids(
+        self,
+        env_ids: np.ndarray,
+        timeout: float | None = None,
+    ) -> tuple[Any, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Waits for the steps of `env_ids` and returns their results batched in the order of `env_ids`."""
+        self._assert_is_running()
+        env_ids = np.asarray(env_ids)
+        if not self._stepping[env_ids].all():
+            raise NoAsyncCallError(
+                "Calling `step_wait_ids` without any prior call to `step_async_ids` for these envs.",
+                AsyncState.WAITING_STEP.value,
+            )
+
+        if not all(self.parent_pipes[env_id].poll(timeout) for env_id in env_ids):
+            raise multiprocessing.TimeoutError(f"The call to `step_wait_ids` has timed out after {timeout} second(s).")
+
+        results, successes = [], []
+        for env_id in env_ids:
+            result, success = self.parent_pipes[env_id].recv()
+            results.append(result)
+            successes.append(success)
+        self._stepping[env_ids] = False
+        if not self._stepping.any():
+            self._state = AsyncState.DEFAULT
+        self._raise_if_errors(successes)
+
+        infos: dict = {}
+        for position, (_, _, _, _, info) in enumerate(results):
+            infos = self._add_info(infos, info, position)
+        # the info arrays are allocated for all the envs
+        infos = _take(infos, np.arange(len(env_ids)))
+
+        # both are new arrays, whatever `copy`
+        if self.shared_memory:
+            observations = _take(self.observations, env_ids)
+        else:
+            observations = concatenate(
+                self.single_observation_space,
+                [result[0] for result in results],
+                create_empty_array(self.single_observation_space, len(env_ids)),
+            )
+        return (
+            observations,
+            np.array([result[1] for result in results], dtype=np.float64),
+            np.array([result[2] for result in results], dtype=np.bool_),
+            np.array([result[3] for result in results], dtype=np.bool_),
+            infos,
+        )
+
+    def step_wait_ready(
+        self,
+        batch_size: int,
+        timeout: float | None = None,
+    ) -> tuple[np.ndarray, tuple[Any, np.ndarray, np.ndarray, np.ndarray, dict]]:
+        """Waits for the first `batch_size` stepping envs to finish, returns their ids and their batched results."""
+        self._assert_is_running()
+        stepping = np.flatnonzero(self._stepping)
+        if len(stepping) == 0:
+            raise NoAsyncCallError(
+                "Calling `step_wait_ready` without any prior call to `step_async_ids`.",
+                AsyncState.WAITING_STEP.value,
+            )
+
+        batch_size = min(batch_size, len(stepping))
+        waiting = {self.parent_pipes[env_id]: env_id for env_id in stepping}
+        ready: list[int] = []
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while len(ready) < batch_size:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+            pipes = wait(list(waiting), remaining)
+            if not pipes:
+                raise multiprocessing.TimeoutError(
+                    f"The call to `step_wait_ready` has timed out after {timeout} second(s).",
+                )
+            ready.extend(waiting.pop(pipe) for pipe in pipes)  # type: ignore[call-overload]
+
+        env_ids = np.sort(ready[:batch_size])
+        return env_ids, self.step_wait_ids(env_ids, timeout)
+
+    def close_extras(self, timeout: float | None = None, terminate: bool = False) -> None:  # type: ignore[override]
+        if not terminate and self._stepping.any():
+            self.step_wait_ids(self.stepping_ids, timeout)
+        super().close_extras(timeout, terminate)
+
+    def reconfigure_ids(
+        self,
+        env_fns: Sequence[Callable[[], Env]],
+        env_ids: Sequence[int] | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        """Replaces the envs of `env_ids` (all by default) by new envs with the same spaces, to be reset before stepping.
+
+        The workers build the new envs in place, so that the processes (and their imports) are
+        reused to switch of env ID or task.
+        """
+        self._assert_is_running()
+        if self._state != AsyncState.DEFAULT:
+            raise AlreadyPendingCallError(
+                f"Calling `reconfigure_ids` while waiting for a pending call to `{self._state.value}` to complete.",
+                str(self._state.value),
+            )
+        env_ids = list(range(self.num_envs)) if env_ids is None else list(env_ids)
+        assert len(env_fns) == len(env_ids), "number of env_fns must match number of env_ids"
+
+        spaces = (self.single_observation_space, self.single_action_space)
+        for env_id, env_fn in zip(env_ids, env_fns, strict=True):
+            self.parent_pipes[env_id].send(("_reconfigure", (CloudpickleWrapper(env_fn), spaces)))
+        if not all(self.parent_pipes[env_id].poll(timeout) for env_id in env_ids):
+            raise multiprocessing.TimeoutError(
+                f"The call to `reconfigure_ids` has timed out after {timeout} second(s).",
+            )
+        results, successes = zip(*[self.parent_pipes[env_id].recv() for env_id in env_ids], strict=True)
+        self._raise_if_errors(list(successes))
+        if not all(results):
+            mismatched = [env_id for env_id, same_spaces in zip(env_ids, results, strict=True) if not same_spaces]
+            raise ValueError(
+                f"The new envs {mismatched} must have the spaces of the vector env, they were not replaced.",
+            )
+
     def call_ids(self, name: str, *args: Any, **kwargs: Any) -> tuple[Any, ...]:
         """Asynchronously calls a method by name on all environments and waits for the result."""
         self.call_async_ids(name, *args, **kwargs)
@@ -52,6 +258,98 @@ class AsyncVectorEnv(OriginalAsyncVectorEnv):
         self._state: AsyncState = AsyncState.WAITING_CALL
 
 
+def _async_worker(
+    index: int,
+    env_fn: Callable[[], Env],
+    pipe: Connection,
+    parent_pipe: Connection,
+    shared_memory: Any,
+    error_queue: multiprocessing.Queue,
+) -> None:
+    """Gymnasium's worker loop, with a `_reconfigure` command replacing the env of the worker."""
+    env = env_fn()
+    observation_space = env.observation_space
+    action_space = env.action_space
+    autoreset = False
+
+    parent_pipe.close()
+
+    try:
+        while True:
+            command, data = pipe.recv()
+
+            if command == "reset":
+                observation, info = env.reset(**data)
+                autoreset = False
+                if shared_memory:
+                    write_to_shared_memory(observation_space, index, observation, shared_memory)
+                    observation = None
+                pipe.send(((observation, info), True))
+            elif command == "step":
+                if autoreset:
+                    observation, info = env.reset()
+                    reward, terminated, truncated = 0, False, False
+                else:
+                    observation, reward, terminated, truncated, info = env.step(data)
+                autoreset = terminated or truncated
+
+                if shared_memory:
+                    write_to_shared_memory(observation_space, index, observation, shared_memory)
+                    observation = None
+
+                pipe.send(((observation, reward, terminated, truncated, info), True))
+            elif command == "close":
+                pipe.send((None, True))
+                break
+            elif command == "_call":
+                name, args, kwargs = data
+                if name in ["reset", "step", "close", "set_wrapper_attr"]:
+                    raise ValueError(f"Trying to call function `{name}` with `call`, use `{name}` directly instead.")
+
+                attr = env.get_wrapper_attr(name)
+                if callable(attr):
+                    pipe.send((attr(*args, **kwargs), True))
+                else:
+                    pipe.send((attr, True))
+            elif command == "_setattr":
+                name, value = data
+                env.set_wrapper_attr(name, value)
+                pipe.send((None, True))
+            elif command == "_check_spaces":
+                pipe.send(((data[0] == observation_space, data[1] == action_space), True))
+            elif command == "_reconfigure":
+                # the new env replaces the current one only if it can be batched with the other envs
+                new_env_fn, (expected_observation_space, expected_action_space) = data
+                new_env = new_env_fn()
+                same_spaces = (
+                    new_env.observation_space == expected_observation_space
+                    and new_env.action_space == expected_action_space
+                )
+                if same_spaces:
+                    env.close()
+                    env, autoreset = new_env, False
+                else:
+                    new_env.close()
+                pipe.send((same_spaces, True))
+            else:
+                raise RuntimeError(
+                    f"Received unknown command `{command}`. Must be one of "
+                    "[`reset`, `step`, `close`, `_call`, `_setattr`, `_check_spaces`, `_reconfigure`].",
+                )
+    except (KeyboardInterrupt, Exception):
+        error_queue.put((index, *sys.exc_info()[:2]))
+        pipe.send((None, False))
+    finally:
+        env.close()
+
+
+def apply_wrappers(env: Env, wrappers: Sequence[Callable[[Env], Wrapper]]) -> Env:
+    """Wraps an environment with each of the wrappers, in order."""
+    for wrapper in wrappers:
+        env = wrapper(env)
+    return env
+
+
 def gym_vector_env_creator(
     env_fns: list,
     vectorization_mode: str,
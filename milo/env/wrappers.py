@@ -0,0 +1,140 @@
+import inspect
+from collections.abc import Sequence
+from typing import Any, SupportsFloat
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import Env
+from gymnasium.spaces import Box
+
+
+class RenderInfo(gym.Wrapper):
+    """Renders the env after every step and reset and returns the frame in `info["pixels"]`.
+
+    Used inside the workers of a vector env, the frames are rendered in parallel and come back
+    with the step results instead of needing a `render` call on every env. The frames are rendered
+    at `frame_size` (height, width) and from `camera_id` when the env's `render` accepts them (as
+    `DMC2Gym` does), and are otherwise resized with nearest neighbour sampling.
+    """
+
+    def __init__(
+        self,
+        env: Env,
+        frame_size: tuple[int, int] | None = None,
+        camera_id: int | None = None,
+    ) -> None:
+        super().__init__(env)
+        self.frame_size = frame_size
+
+        parameters = inspect.signature(env.unwrapped.render).parameters
+        self._render_kwargs: dict[str, Any] = {}
+        if frame_size is not None and {"height", "width"} <= parameters.keys():
+            self._render_kwargs.update(height=frame_size[0], width=frame_size[1])
+        if camera_id is not None:
+            if "camera_id" not in parameters:
+                raise ValueError(f"The render method of {env.unwrapped} does not take a camera_id.")
+            self._render_kwargs["camera_id"] = camera_id
+
+    def _render_frame(self) -> np.ndarray:
+        frame = np.asarray(self.env.unwrapped.render(**self._render_kwargs))
+        if self.frame_size is not None and frame.shape[:2] != self.frame_size:
+            height, width = frame.shape[:2]
+            rows = np.arange(self.frame_size[0]) * height // self.frame_size[0]
+            columns = np.arange(self.frame_size[1]) * width // self.frame_size[1]
+            frame = frame[rows[:, None], columns]
+        return frame
+
+    def step(self, action: Any) -> tuple[Any, SupportsFloat, bool, bool, dict[str, Any]]:
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        return obs, reward, terminated, truncated, {**info, "pixels": self._render_frame()}
+
+    def reset(self, *, seed: int | None = None, options: dict[str, Any] | None = None) -> tuple[Any, dict[str, Any]]:
+        obs, info = self.env.reset(seed=seed, options=options)
+        return obs, {**info, "pixels": self._render_frame()}
+
+
+class ActionRepeat(gym.Wrapper):
+    """Repeats every action `repeat` times, summing the rewards, until the episode ends.
+
+    Applied inside the workers of a vector env, the repeated steps cost a single exchange with
+    the worker. The returned observation and info are those of the last repeated step.
+    """
+
+    def __init__(self, env: Env, repeat: int) -> None:
+        if repeat < 1:
+            raise ValueError(f"repeat must be positive, but got {repeat=}.")
+        super().__init__(env)
+        self.repeat = repeat
+
+    def step(self, action: Any) -> tuple[Any, SupportsFloat, bool, bool, dict[str, Any]]:
+        total_reward = 0.0
+        for _ in range(self.repeat):
+            obs, reward, terminated, truncated, info = self.env.step(action)
+            total_reward += float(reward)
+            if terminated or truncated:
+                break
+        return obs, total_reward, terminated, truncated, info
+
+
+class PadTask(gym.Wrapper):
+    """Pads the flat observations and actions of an env to common spaces and tags its results with a task id.
+
+    Envs of different tasks wrapped with the same spaces (see `common_padded_spaces`) can run in a
+    single vector env. The padded observation entries are zeros, the padded action entries are
+    ignored and the others are clipped to the bounds of the env. `info["task_id"]` is set on every
+    step and reset.
+    """
+
+    def __init__(self, env: Env, observation_space: Box, action_space: Box, task_id: int) -> None:
+        super().__init__(env)
+        env_observation_space, env_action_space = env.observation_space, env.action_space
+        if not isinstance(env_observation_space, Box) or not isinstance(env_action_space, Box):
+            raise ValueError(f"Only Box spaces can be padded, but got {env_observation_space} and {env_action_space}.")
+        self._observation_size = int(np.prod(env_observation_space.shape))
+        self._action_size = int(np.prod(env_action_space.shape))
+        if self._observation_size > observation_space.shape[0] or self._action_size > action_space.shape[0]:
+            raise ValueError(
+                f"Cannot pad spaces of sizes {self._observation_size} and {self._action_size} "
+                f"to {observation_space.shape[0]} and {action_space.shape[0]}.",
+            )
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.task_id = task_id
+        self._padded_observation_size = observation_space.shape[0]
+        self._action_low = env_action_space.low.ravel()
+        self._action_high = env_action_space.high.ravel()
+        self._action_shape = env_action_space.shape
+
+    def _pad_observation(self, observation: Any) -> np.ndarray:
+        padded = np.zeros(self._padded_observation_size, dtype=np.float32)
+        padded[: self._observation_size] = np.ravel(observation)
+        return padded
+
+    def step(self, action: Any) -> tuple[Any, SupportsFloat, bool, bool, dict[str, Any]]:
+        action = np.clip(np.asarray(action)[: self._action_size], self._action_low, self._action_high)
+        obs, reward, terminated, truncated, info = self.env.step(action.reshape(self._action_shape))
+        return self._pad_observation(obs), reward, terminated, truncated, {**info, "task_id": self.task_id}
+
+    def reset(self, *, seed: int | None = None, options: dict[str, Any] | None = None) -> tuple[Any, dict[str, Any]]:
+        obs, info = self.env.reset(seed=seed, options=options)
+        return self._pad_observation(obs), {**info, "task_id": self.task_id}
+
+
+def common_padded_spaces(spaces: Sequence[tuple[Box, Box]]) -> tuple[Box, Box]:
+    """Returns the flat observation and action spaces containing the padded `(observation, action)` spaces of all the tasks."""
+    observation_size = max(int(np.prod(observation_space.shape)) for observation_space, _ in spaces)
+    action_size = max(int(np.prod(action_space.shape)) for _, action_space in spaces)
+
+    def union(boxes: list[Box], size: int) -> Box:
+        # the padded entries are zeros
+        low = np.zeros((len(boxes), size), dtype=np.float32)
+        high = np.zeros((len(boxes), size), dtype=np.float32)
+        for i, box in enumerate(boxes):
+            low[i, : box.low.size] = box.low.ravel()
+            high[i, : box.high.size] = box.high.ravel()
+        return Box(low.min(axis=0), high.max(axis=0), dtype=np.float32)
+
+    return (
+        union([observation_space for observation_space, _ in spaces], observation_size),
+        union([action_space for _, action_space in spaces], action_size),
+    )
@@ -0,0 +1,3 @@
+from milo.policy.base import BasePolicy
+
+__all__ = ["BasePolicy"]
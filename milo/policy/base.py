@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import torch
+from gymnasium.spaces import Box, Discrete, Space
+from torch import nn
+
+
+class BasePolicy(nn.Module, ABC):
+    """Maps a batch of observations `(num_envs, *obs_shape)` to a batch of actions in one forward pass.
+
+    `exploration_noise` perturbs the batch of actions in a vectorized way: gaussian noise of
+    standard deviation `noise_std` clipped to the bounds for `Box` action spaces, and uniformly
+    random actions with probability `epsilon` for `Discrete` action spaces.
+    """
+
+    def __init__(
+        self,
+        action_space: Space,
+        noise_std: float = 0.1,
+        epsilon: float = 0.1,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__()
+        self.action_space = action_space
+        self.noise_std = noise_std
+        self.epsilon = epsilon
+        self._rng = np.random.default_rng(seed)
+
+    @abstractmethod
+    def forward(self, obs: torch.Tensor) -> torch.Tensor:
+        """Returns the batch of actions for a batch of observations."""
+
+    @property
+    def device(self) -> torch.device:
+        parameter = next(self.parameters(), None)
+        return torch.device("cpu") if parameter is None else parameter.device
+
+    def exploration_noise(self, actions: np.ndarray) -> np.ndarray:
+        """Perturbs a batch of actions in place and returns it."""
+        if isinstance(self.action_space, Box) and self.noise_std > 0:
+            actions += self._rng.normal(0.0, self.noise_std, size=actions.shape).astype(actions.dtype, copy=False)
+            np.clip(actions, self.action_space.low, self.action_space.high, out=actions)
+        elif isinstance(self.action_space, Discrete) and self.epsilon > 0:
+            explore = self._rng.random(len(actions)) < self.epsilon
+            actions[explore] = self.action_space.start + self._rng.integers(
+                self.action_space.n,
+                size=int(explore.sum()),
+            )
+        return actions
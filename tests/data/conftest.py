@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from milo.data.transition import Transition
+
+
+def _make_vector_transition(
+    step: int,
+    num_envs: int = 2,
+    discrete: bool = False,
+    reward_per_env: float = 0.0,
+) -> Transition:
+    """Builds the vector step `step` of `num_envs` envs, whose observations and rewards tell the step."""
+    env_ids = np.arange(num_envs)
+    return Transition(
+        obs=np.full((num_envs, 3), step, dtype=np.float32),
+        action=np.zeros(num_envs, dtype=np.int64) if discrete else np.full((num_envs, 1), step, dtype=np.float32),
+        reward=reward_per_env * env_ids + float(step),
+        next_obs=np.full((num_envs, 3), step + 1, dtype=np.float32),
+        done=np.zeros(num_envs, dtype=np.bool_),
+        terminated=np.zeros(num_envs, dtype=np.bool_),
+        truncated=np.zeros(num_envs, dtype=np.bool_),
+        info={
+            "success": env_ids > 0,
+            "_success": np.ones(num_envs, dtype=np.bool_),
+            "discount": np.ones(num_envs),
+            "_discount": np.ones(num_envs, dtype=np.bool_),
+        },
+    )
+
+
+@pytest.fixture
+def make_vector_transition():
+    return _make_vector_transition
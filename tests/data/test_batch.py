@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+import torch
+
+from milo.data.batch import Batch, TensorConverter
+from milo.data.transition import Transition
+
+
+def make_batch(size: int = 4) -> Batch:
+    return Batch(
+        {
+            "obs": np.arange(size * 3, dtype=np.float32).reshape(size, 3),
+            "reward": np.arange(size, dtype=np.float64),
+            "done": np.zeros(size, dtype=np.bool_),
+            "info": np.array([{}] * size, dtype=object),
+        },
+    )
+
+
+def test_batch_from_transitions():
+    batch = Batch([Transition(np.zeros(3), 0, 1.0, np.ones(3), False) for _ in range(5)])
+    assert len(batch) == 5
+    assert batch.obs.shape == (5, 3)
+    np.testing.assert_array_equal(batch.next_obs, np.ones((5, 3)))
+
+
+def test_to_torch_cpu_shares_memory():
+    batch = make_batch()
+    obs = batch.obs
+    batch.to_torch()
+
+    assert isinstance(batch.obs, torch.Tensor)
+    assert isinstance(batch.info, np.ndarray)
+    assert batch.obs.data_ptr() == obs.ctypes.data
+
+    batch.to_numpy()
+    assert isinstance(batch.obs, np.ndarray)
+    assert np.shares_memory(batch.obs, obs)
+
+
+def test_converter_reuses_device_tensors():
+    converter = TensorConverter("meta")
+    first, second = make_batch(), make_batch()
+    first.to_torch(converter=converter)
+    second.to_torch(converter=converter)
+
+    assert first.obs is second.obs
+    assert second.obs.device.type == "meta"
+    assert second.obs.dtype == torch.float32
+
+    # a new shape allocates a new tensor
+    third = make_batch(size=2)
+    third.to_torch(converter=converter)
+    assert third.obs is not second.obs
+    assert third.obs.shape == (2, 3)
+
+
+def test_converter_pinned_fallback():
+    converter = TensorConverter("cuda", pin_memory=True, non_blocking=True)
+    if not torch.cuda.is_available():
+        assert not converter.pin_memory
+        assert not converter.non_blocking
+
+
+def test_batch_from_transitions_skips_unset_fields():
+    transitions = [Transition(np.zeros(3), 0, 1.0, np.ones(3), False, info=None) for _ in range(3)]
+    assert not hasattr(transitions[0], "__dict__")
+
+    batch = Batch(transitions)
+    assert batch.terminated is None
+    assert batch.info is None
+    assert batch.reward.shape == (3,)
+    with pytest.raises(AttributeError):
+        batch.unknown
+
+
+def test_batch_schema():
+    schema = {"obs": {"shape": [3], "dtype": "<f4"}, "reward": {"shape": [], "dtype": "<f8"}}
+    assert Batch({"obs": np.zeros((4, 3))}, schema=schema).schema is schema
+    with pytest.raises(ValueError):
+        Batch({"pixels": np.zeros((4, 2, 2, 3))}, schema=schema)
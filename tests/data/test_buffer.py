@@ -0,0 +1,342 @@
+import pickle
+
+import numpy as np
+import pytest
+from gymnasium.spaces import Box, Discrete
+
+from milo.data.batch import Batch
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.transition import Transition, extract_info, info_dtype
+
+
+def make_transition(step: int) -> Transition:
+    return Transition(
+        obs=np.full(3, step, dtype=np.float32),
+        action=step % 2,
+        reward=float(step),
+        next_obs=np.full(3, step + 1, dtype=np.float32),
+        done=False,
+        terminated=False,
+        truncated=False,
+    )
+
+
+@pytest.fixture
+def buffer():
+    return ReplayBuffer(5, observation_space=Box(-np.inf, np.inf, (3,), np.float32), action_space=Discrete(2))
+
+
+def test_preallocation(buffer):
+    assert buffer._data["obs"].shape == (1, 5, 3)
+    assert buffer._data["obs"].dtype == np.float32
+    assert buffer._data["next_obs"].shape == (1, 5, 3)
+    assert buffer._data["action"].shape == (1, 5)
+    assert len(buffer) == 0
+
+
+def test_push_writes_in_place(buffer):
+    obs_array = buffer._data["obs"]
+    for step in range(3):
+        buffer.push(make_transition(step))
+
+    assert len(buffer) == 3
+    assert buffer._data["obs"] is obs_array
+    assert buffer[0].reward == 0.0
+    assert buffer[-1].reward == 2.0
+    np.testing.assert_array_equal(buffer[1].next_obs, np.full(3, 2))
+
+
+def test_ring_eviction(buffer):
+    for step in range(8):
+        buffer.push(make_transition(step))
+
+    assert len(buffer) == buffer.capacity
+    # the three oldest steps were overwritten, insertion order is preserved
+    assert [buffer[i].reward for i in range(len(buffer))] == [3.0, 4.0, 5.0, 6.0, 7.0]
+
+    with pytest.raises(IndexError):
+        buffer[5]
+
+
+def test_missing_field_raises(buffer):
+    buffer.push(make_transition(0))
+    with pytest.raises(ValueError):
+        buffer.push(Transition(np.zeros(3), 0, 0.0, np.zeros(3), False))
+
+
+def test_sample_and_batchify(buffer):
+    for step in range(8):
+        buffer.push(make_transition(step))
+
+    batch = buffer.sample(3)
+    assert isinstance(batch, Batch)
+    assert batch.obs.shape == (3, 3)
+    assert set(batch.reward) <= {3.0, 4.0, 5.0, 6.0, 7.0}
+
+    full = buffer.batchify()
+    assert len(full) == 5
+    np.testing.assert_array_equal(full.reward, [3.0, 4.0, 5.0, 6.0, 7.0])
+
+
+def test_reset_keeps_arrays(buffer):
+    buffer.push(make_transition(0))
+    obs_array = buffer._data["obs"]
+    buffer.reset()
+    assert len(buffer) == 0
+    assert buffer._data["obs"] is obs_array
+
+
+def test_sample_is_seeded():
+    def sample_rewards(seed):
+        buffer = ReplayBuffer(10, seed=seed)
+        for step in range(10):
+            buffer.push(make_transition(step))
+        return buffer.sample(6).reward
+
+    np.testing.assert_array_equal(sample_rewards(3), sample_rewards(3))
+    assert not np.array_equal(sample_rewards(3), sample_rewards(4))
+
+
+def test_sample_reuse_memory(buffer):
+    for step in range(5):
+        buffer.push(make_transition(step))
+
+    first = buffer.sample(4, reuse_memory=True)
+    first_obs = first.obs
+    second = buffer.sample(4, reuse_memory=True)
+    assert second.obs is first_obs
+    # rows stay consistent across fields
+    np.testing.assert_array_equal(second.obs[:, 0], second.reward)
+
+    assert buffer.sample(4).obs is not first_obs
+
+
+def test_sample_reuse_memory_new_field(vector_buffer, make_vector_transition):
+    vector_buffer.push(make_vector_transition(0, 3, discrete=True, reward_per_env=10.0))
+    vector_buffer.sample(4, reuse_memory=True)
+
+    # the first push carrying pixels allocates the field after the output arrays
+    transition = make_vector_transition(1, 3, discrete=True, reward_per_env=10.0)
+    transition.pixels = np.full((3, 4, 4, 3), 1, dtype=np.uint8)
+    vector_buffer.push(transition)
+    batch = vector_buffer.sample(4, reuse_memory=True)
+    assert batch.pixels.shape == (4, 4, 4, 3)
+    assert vector_buffer.sample(4, reuse_memory=True, keys=["pixels"]).pixels is batch.pixels
+
+
+def test_sample_empty_raises(buffer):
+    with pytest.raises(ValueError):
+        buffer.sample(1)
+
+
+@pytest.fixture
+def vector_buffer():
+    return ReplayBuffer(
+        12,
+        observation_space=Box(-np.inf, np.inf, (3,), np.float32),
+        action_space=Discrete(2),
+        num_envs=3,
+        seed=0,
+    )
+
+
+def test_per_env_rows(vector_buffer, make_vector_transition):
+    for step in range(2):
+        vector_buffer.push(make_vector_transition(step, 3, discrete=True, reward_per_env=10.0))
+
+    # each vector step is stored as one row per env
+    assert len(vector_buffer) == 6
+    assert vector_buffer._data["obs"].shape == (3, 4, 3)
+
+    batch = vector_buffer.sample(5)
+    assert len(batch) == 5
+    assert batch.obs.shape == (5, 3)
+    np.testing.assert_array_equal(batch.reward % 10, batch.obs[:, 0])
+    np.testing.assert_array_equal(batch.reward // 10, batch.env_id)
+
+    assert vector_buffer[1].reward == 1.0
+    assert vector_buffer[0].info == {"success": False, "discount": 1.0}
+    assert vector_buffer[2].info == {"success": True, "discount": 1.0}
+
+
+def test_push_without_info(vector_buffer, make_vector_transition):
+    transition = make_vector_transition(0, 3, discrete=True)
+    transition.info = None
+    vector_buffer.push(transition)
+    assert "info" not in vector_buffer._data
+    assert vector_buffer.sample(2).info is None
+
+    # once stored, a missing info is an empty dict
+    buffer = ReplayBuffer(12, num_envs=3)
+    buffer.push(make_vector_transition(0, 3, discrete=True))
+    buffer.push(transition)
+    assert buffer[1].info == {}
+
+
+def test_per_env_ring_eviction(vector_buffer, make_vector_transition):
+    for step in range(6):
+        vector_buffer.push(make_vector_transition(step, 3, discrete=True, reward_per_env=10.0))
+
+    assert len(vector_buffer) == vector_buffer.capacity
+    full = vector_buffer.batchify()
+    np.testing.assert_array_equal(full.env_id, np.repeat(np.arange(3), 4))
+    np.testing.assert_array_equal(full.reward[:4], [2.0, 3.0, 4.0, 5.0])
+
+
+def test_push_subset_of_envs(vector_buffer, make_vector_transition):
+    vector_buffer.push(make_vector_transition(0, 3, discrete=True, reward_per_env=10.0))
+    partial = make_vector_transition(1, 2, discrete=True, reward_per_env=10.0)
+    vector_buffer.push(partial, env_ids=np.array([0, 2]))
+
+    assert len(vector_buffer) == 5
+    np.testing.assert_array_equal(vector_buffer._size, [2, 1, 2])
+    assert vector_buffer[4].reward == 11.0
+
+
+def test_sequence_views(vector_buffer, make_vector_transition):
+    for step in range(6):
+        vector_buffer.push(make_vector_transition(step, 3, discrete=True, reward_per_env=10.0))
+
+    window = vector_buffer.sequence(1, 0, 2)
+    np.testing.assert_array_equal(window.reward, [12.0, 13.0])
+    assert np.shares_memory(window.obs, vector_buffer._data["obs"])
+
+    # the window wraps around the end of the ring, rows are gathered
+    wrapped = vector_buffer.sequence(1, 1, 3)
+    np.testing.assert_array_equal(wrapped.reward, [13.0, 14.0, 15.0])
+
+    with pytest.raises(IndexError):
+        vector_buffer.sequence(1, 2, 3)
+
+
+def push_episodes(buffer, make_vector_transition, episode_ends, num_steps):
+    for step in range(num_steps):
+        transition = make_vector_transition(step, 3, discrete=True, reward_per_env=10.0)
+        transition.done[:] = step in episode_ends
+        transition.terminated[:] = step in episode_ends
+        buffer.push(transition)
+
+
+def test_sample_sequences(vector_buffer, make_vector_transition):
+    push_episodes(vector_buffer, make_vector_transition, episode_ends={1}, num_steps=6)
+
+    batch = vector_buffer.sample_sequences(16, 2)
+    assert batch.obs.shape == (16, 2, 3)
+    assert batch.reward.shape == batch.env_id.shape == (16, 2)
+    # the rows of a window are consecutive steps of a single env
+    np.testing.assert_array_equal(batch.env_id[:, 0], batch.env_id[:, 1])
+    np.testing.assert_array_equal(np.diff(batch.reward, axis=1), 1.0)
+    # only the last row of a window may end an episode
+    assert not batch.done[:, :-1].any()
+
+    with pytest.raises(ValueError):
+        vector_buffer.sample_sequences(1, 5)
+
+
+def test_sample_sequences_fallback(vector_buffer, make_vector_transition):
+    # the single window of 4 rows within an episode is found once rejections are exhausted
+    push_episodes(vector_buffer, make_vector_transition, episode_ends={2, 6}, num_steps=7)
+
+    batch = vector_buffer.sample_sequences(8, 4, max_rejections=0)
+    np.testing.assert_array_equal(batch.reward % 10, np.broadcast_to([3.0, 4.0, 5.0, 6.0], (8, 4)))
+
+    push_episodes(vector_buffer, make_vector_transition, episode_ends={0, 1, 2, 3}, num_steps=4)
+    with pytest.raises(ValueError):
+        vector_buffer.sample_sequences(1, 3, max_rejections=0)
+
+
+def test_sample_n_step(vector_buffer, make_vector_transition):
+    push_episodes(vector_buffer, make_vector_transition, episode_ends={1}, num_steps=4)
+
+    batch = vector_buffer.sample_n_step(32, 3, gamma=0.5)
+    steps = batch.obs[:, 0].astype(np.int64)
+    offsets = batch.env_id * 10
+    # the returns stop at the end of the episode and at the newest row
+    expected = {
+        0: (offsets + 0.5 * (offsets + 1), 2, 2.0, True),
+        1: (offsets + 1.0, 1, 2.0, True),
+        2: (offsets + 2 + 0.5 * (offsets + 3), 2, 4.0, False),
+        3: (offsets + 3.0, 1, 4.0, False),
+    }
+    for step, (returns, num_rewards, next_obs, done) in expected.items():
+        rows = steps == step
+        np.testing.assert_allclose(batch.reward[rows], returns[rows])
+        np.testing.assert_allclose(batch.discount[rows], 0.5**num_rewards)
+        np.testing.assert_array_equal(batch.next_obs[rows, 0], next_obs)
+        np.testing.assert_array_equal(batch.done[rows], done)
+
+    with pytest.raises(ValueError):
+        vector_buffer.sample_n_step(4, 0)
+
+
+def test_typed_info(vector_buffer, make_vector_transition):
+    schema = {"success": np.bool_, "pose": (np.float32, (2,))}
+    for step in range(2):
+        transition = make_vector_transition(step, 3, discrete=True, reward_per_env=10.0)
+        transition.info = extract_info(transition.info, schema, 3)
+        vector_buffer.push(transition)
+
+    assert vector_buffer._data["info"].dtype == info_dtype(schema)
+    batch = vector_buffer.batchify()
+    np.testing.assert_array_equal(batch.info["success"], batch.env_id > 0)
+    # the keys missing from the info are zeros
+    np.testing.assert_array_equal(batch.info["pose"], 0.0)
+
+
+def test_extract_info():
+    info = {
+        "success": np.array([True, False, True]),
+        "_success": np.array([True, True, False]),
+        "pose": np.ones((3, 2)),
+        "_pose": np.ones(3, dtype=np.bool_),
+        "ignored": np.arange(3),
+    }
+    rows = extract_info(info, {"success": np.bool_, "pose": (np.float32, (2,))}, 3)
+    assert rows.dtype.names == ("success", "pose")
+    np.testing.assert_array_equal(rows["success"], [True, False, False])
+    assert rows["pose"].shape == (3, 2)
+
+
+def test_schema(vector_buffer, make_vector_transition):
+    vector_buffer.push(make_vector_transition(0, 3, discrete=True, reward_per_env=10.0))
+    schema = vector_buffer.schema
+    assert schema["obs"] == {"shape": [3], "dtype": "<f4"}
+    assert schema["env_id"] == {"shape": [], "dtype": "<i8"}
+    assert vector_buffer.schema is schema
+
+
+def test_sample_keys(vector_buffer, make_vector_transition):
+    for step in range(2):
+        transition = make_vector_transition(step, 3, discrete=True, reward_per_env=10.0)
+        transition.pixels = np.full((3, 4, 4, 3), step, dtype=np.uint8)
+        vector_buffer.push(transition)
+
+    batch = vector_buffer.sample(5, keys=["obs", "reward"])
+    assert batch.keys() == ["obs", "reward"]
+    assert batch.schema == vector_buffer.schema
+    assert batch.pixels is None
+    np.testing.assert_array_equal(batch.reward % 10, batch.obs[:, 0])
+
+    # the rows of all the fields are gathered when sampling
+    batch = vector_buffer.sample(5)
+    np.testing.assert_array_equal(batch.pixels[:, 0, 0, 0], batch.obs[:, 0])
+
+    with pytest.raises(ValueError):
+        vector_buffer.sample(5, keys=["obs", "unknown"])
+
+
+def test_sampled_rows_are_kept_after_pushes(vector_buffer, make_vector_transition):
+    for step in range(vector_buffer.env_capacity):
+        vector_buffer.push(make_vector_transition(step, 3, discrete=True, reward_per_env=10.0))
+    batch = vector_buffer.sample(5, keys=["obs", "reward"])
+    obs, reward = batch.obs.copy(), batch.reward.copy()
+    # the pushes overwrite every row of the buffer
+    for step in range(vector_buffer.env_capacity):
+        vector_buffer.push(make_vector_transition(100 + step, 3, discrete=True, reward_per_env=10.0))
+    np.testing.assert_array_equal(batch.obs, obs)
+    np.testing.assert_array_equal(batch.reward, reward)
+
+    # a pickled batch only holds its rows
+    data = pickle.dumps(batch)
+    assert len(data) < 1000
+    np.testing.assert_array_equal(pickle.loads(data).obs, obs)
@@ -0,0 +1,305 @@
+import time
+
+import gymnasium as gym
+import numpy as np
+import pytest
+
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.collector import Collector
+from milo.data.dataset import DatasetReader, DatasetWriter
+from milo.env import make_env
+from milo.env.utils import AsyncVectorEnv
+from milo.env.wrappers import RenderInfo
+
+
+@pytest.fixture
+def env():
+    env = make_env("CartPole-v1", num_envs=2, vectorization_mode="sync")
+    yield env
+    env.close()
+
+
+def test_collect_fills_buffer(env):
+    collector = Collector(None, env)
+    collector.reset(seed=13)
+    collector.collect(n_step=20)
+
+    # one row per env and vector step, except the steps resetting the envs after an episode end
+    full = collector.buffer.batchify()
+    # the envs flagged in `_autoreset` have not made their reset step yet
+    num_resets = full.done.sum() - collector._autoreset.sum()
+    assert len(collector.buffer) == 40 - num_resets
+    assert collector.collect_step == 20
+
+    batch = collector.buffer.sample(5)
+    assert batch.obs.shape == (5, *env.single_observation_space.shape)
+    assert batch.action.shape == (5, *env.single_action_space.shape)
+    assert set(batch.env_id) <= {0, 1}
+    # the info dicts are not stored without schema
+    assert batch.info is None
+
+
+def test_collect_vector_rows(env):
+    # without num_envs, the buffer stores each vector step in a single row
+    buffer = ReplayBuffer(100, env.observation_space, env.action_space)
+    collector = Collector(None, env, buffer=buffer)
+    collector.reset(seed=13)
+    collector.collect(n_step=20)
+
+    assert len(buffer) == 20
+    batch = buffer.sample(5)
+    assert batch.obs.shape == (5, *env.observation_space.shape)
+    assert batch.env_id is None
+
+    with pytest.raises(ValueError):
+        Collector(None, env, buffer=ReplayBuffer(100, num_envs=4))
+
+
+def test_collect_requires_reset(env):
+    collector = Collector(None, env)
+    with pytest.raises(ValueError):
+        collector.collect(n_step=1)
+
+
+def test_collect_n_episode(env):
+    collector = Collector(None, env)
+    collector.reset(seed=13)
+    collector.collect(n_episode=2)
+
+    assert collector.collect_episode >= 2
+    assert np.any(collector.buffer.batchify().done)
+
+
+class FrameEnv(gym.Env):
+    """Minimal env rendering its step counter as a uint8 frame."""
+
+    observation_space = gym.spaces.Box(-1.0, 1.0, (2,), np.float32)
+    action_space = gym.spaces.Discrete(2)
+    render_mode = "rgb_array"
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self._step = 0
+        return np.zeros(2, dtype=np.float32), {}
+
+    def step(self, action):
+        self._step += 1
+        return np.zeros(2, dtype=np.float32), 1.0, False, False, {}
+
+    def render(self):
+        return np.full((6, 4, 3), self._step, dtype=np.uint8)
+
+
+def test_collect_render():
+    env = gym.vector.SyncVectorEnv([FrameEnv, FrameEnv])
+    collector = Collector(None, env)
+    collector.reset(seed=13)
+    collector.collect(n_step=3, render=True)
+
+    batch = collector.buffer.batchify()
+    assert batch.pixels.dtype == np.uint8
+    assert batch.pixels.shape == (6, 6, 4, 3)
+    np.testing.assert_array_equal(batch.pixels[:, 0, 0, 0], [1, 2, 3, 1, 2, 3])
+
+
+def test_collect_stats(env):
+    collector = Collector(None, env)
+    collector.reset(seed=13)
+    stats = collector.collect(n_episode=4)
+
+    assert stats.n_collected_steps == collector.collect_step
+    assert stats.n_collected_episodes == len(stats.episode_returns) >= 4
+    # CartPole gives a reward of 1 per step, the autoreset steps are not counted
+    np.testing.assert_array_equal(stats.episode_returns, stats.episode_lengths)
+    assert set(stats.episode_env_ids) <= {0, 1}
+    assert stats.steps_per_second > 0
+    assert set(stats.timings) == {"action", "step", "render", "buffer"}
+    assert sum(stats.timings.values()) <= stats.collect_time
+
+
+def test_collect_stats_spans_calls():
+    env = gym.vector.SyncVectorEnv([lambda: gym.wrappers.TimeLimit(FrameEnv(), max_episode_steps=4)])
+    collector = Collector(None, env)
+    collector.reset(seed=13)
+    assert collector.collect(n_step=3).n_collected_episodes == 0
+
+    # the episode started in the previous call ends, the autoreset step is not counted
+    stats = collector.collect(n_step=5)
+    np.testing.assert_array_equal(stats.episode_lengths, [4])
+    np.testing.assert_array_equal(stats.episode_returns, [4.0])
+    np.testing.assert_array_equal(collector.collect(n_step=2).episode_lengths, [4])
+
+
+def test_collect_pipelined():
+    env = make_env("CartPole-v1", num_envs=4, vectorization_mode="async")
+    collector = Collector(None, env, num_groups=2)
+    collector.reset(seed=13)
+    stats = collector.collect(n_step=10)
+
+    # every env stepped n_step times, the steps resetting the envs after an episode end are not stored
+    assert stats.n_collected_steps == 10
+    full = collector.buffer.batchify()
+    num_resets = [full.done[full.env_id == env_id].sum() for env_id in range(4)] - collector._autoreset
+    np.testing.assert_array_equal(collector.buffer._size, 10 - num_resets)
+    assert stats.timings["step"] > 0
+
+    stats = collector.collect(n_episode=4)
+    assert stats.n_collected_episodes >= 4
+    np.testing.assert_array_equal(stats.episode_returns, stats.episode_lengths)
+    env.close()
+
+
+def test_collect_pipelined_requires_async(env):
+    with pytest.raises(ValueError):
+        Collector(None, env, num_groups=2)
+
+
+class SlowEnv(FrameEnv):
+    """Frame env whose steps take `delay` seconds."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def step(self, action):
+        time.sleep(self.delay)
+        return super().step(action)
+
+
+def test_collect_ready_first():
+    env = AsyncVectorEnv([lambda: SlowEnv(0.05), lambda: SlowEnv(0.0), lambda: SlowEnv(0.0)])
+    collector = Collector(None, env, ready_batch_size=2)
+    collector.reset(seed=13)
+    stats = collector.collect(n_step=10)
+
+    # the fast envs do not wait for the slow one
+    assert stats.n_collected_steps >= 10
+    assert len(collector.buffer) >= 30
+    assert collector.buffer._size[0] < collector.buffer._size[1]
+    env.close()
+
+
+def test_collect_ready_first_errors(env):
+    with pytest.raises(ValueError):
+        Collector(None, env, ready_batch_size=1)
+    with pytest.raises(ValueError):
+        Collector(None, make_env("CartPole-v1", num_envs=2), ready_batch_size=3)
+
+
+@pytest.mark.parametrize("kwargs", [{"num_groups": 2}, {"ready_batch_size": 2}], ids=["pipelined", "ready"])
+def test_collect_error_waits_for_steps(kwargs, monkeypatch):
+    env = AsyncVectorEnv([lambda: gym.make("CartPole-v1")] * 4)
+    collector = Collector(None, env, **kwargs)
+    collector.reset(seed=13)
+
+    add_to_buffer = collector._add_to_buffer
+    num_calls = 0
+
+    def failing_add_to_buffer(transition, env_ids=None):
+        nonlocal num_calls
+        num_calls += 1
+        if num_calls == 3:
+            raise RuntimeError("Failed to push.")
+        add_to_buffer(transition, env_ids)
+
+    monkeypatch.setattr(collector, "_add_to_buffer", failing_add_to_buffer)
+    with pytest.raises(RuntimeError):
+        collector.collect(n_step=5)
+    assert len(env.stepping_ids) == 0
+
+    # the collector can be reset and used again
+    monkeypatch.undo()
+    collector.reset(seed=13)
+    assert collector.collect(n_step=5).n_collected_steps == 5
+    env.close()
+
+
+def test_collect_render_in_workers():
+    env = AsyncVectorEnv([lambda: RenderInfo(FrameEnv())] * 4)
+    collector = Collector(None, env, num_groups=2)
+    collector.reset(seed=13)
+    collector.collect(n_step=3, render=True)
+
+    batch = collector.buffer.batchify()
+    assert batch.pixels.shape == (12, 6, 4, 3)
+    np.testing.assert_array_equal(batch.pixels[:3, 0, 0, 0], [1, 2, 3])
+    # the info, holding the frames in the workers, is not stored without schema
+    assert batch.info is None
+
+    # the buffer stores pixels, the next steps must be rendered too
+    with pytest.raises(ValueError):
+        collector.collect(n_step=1)
+    assert len(collector.buffer) == 12
+
+    env.close()
+
+    # without rendering in the workers, the frames would need a render call on all the envs
+    env = make_env("CartPole-v1", num_envs=2)
+    collector = Collector(None, env, num_groups=2)
+    collector.reset(seed=13)
+    with pytest.raises(ValueError):
+        collector.collect(n_step=1, render=True)
+    env.close()
+
+
+def test_collect_streams_to_dataset(env, tmp_path):
+    dataset = DatasetWriter(tmp_path / "dataset", shard_size=16)
+    collector = Collector(None, env, dataset=dataset)
+    collector.reset(seed=13)
+    collector.collect(n_step=20)
+    collector.close()
+
+    reader = DatasetReader(tmp_path / "dataset")
+    assert len(reader) == len(collector.buffer)
+    assert [shard["num_rows"] for shard in reader.shards[:-1]] == [16, 16]
+    batch = next(reader.iter_batches(len(reader)))
+    # the same rows as in the buffer, interleaved by step
+    full = collector.buffer.batchify()
+    for env_id in [0, 1]:
+        np.testing.assert_array_equal(batch.obs[batch.env_id == env_id], full.obs[full.env_id == env_id])
+        np.testing.assert_array_equal(batch.reward[batch.env_id == env_id], full.reward[full.env_id == env_id])
+
+
+class SuccessInfo(gym.Wrapper):
+    """Reports the termination of the episode as a success in the info."""
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        return obs, reward, terminated, truncated, {**info, "success": terminated, "extra": "dropped"}
+
+
+def test_collect_info_schema():
+    env = gym.vector.SyncVectorEnv([lambda: SuccessInfo(gym.make("CartPole-v1"))] * 2)
+    collector = Collector(None, env, info_schema={"success": np.bool_})
+    collector.reset(seed=13)
+    collector.collect(n_step=50)
+
+    batch = collector.buffer.batchify()
+    assert batch.info.dtype.names == ("success",)
+    np.testing.assert_array_equal(batch.info["success"], batch.terminated)
+    collector.close()
+
+
+def test_collect_skips_autoreset_steps():
+    env = gym.vector.SyncVectorEnv([lambda: gym.make("CartPole-v1")] * 2)
+    collector = Collector(None, env)
+    collector.reset(seed=13)
+    stats = collector.collect(n_step=200)
+    assert stats.n_collected_episodes > 2
+
+    # every stored row is a step of an episode, the resetting steps (with a zero reward) are not stored
+    full = collector.buffer.batchify()
+    np.testing.assert_array_equal(full.reward, 1.0)
+    for env_id in [0, 1]:
+        rows = full.env_id == env_id
+        obs, next_obs, done = full.obs[rows], full.next_obs[rows], full.done[rows]
+        np.testing.assert_array_equal(obs[1:][~done[:-1]], next_obs[:-1][~done[:-1]])
+        assert not np.array_equal(obs[1:][done[:-1]], next_obs[:-1][done[:-1]])
+
+    # the windows and n-step returns stay within an episode
+    batch = collector.buffer.sample_sequences(64, 4)
+    assert not batch.done[:, :-1].any()
+    np.testing.assert_array_equal(batch.obs[:, 1:], batch.next_obs[:, :-1])
+    # with unit rewards, k summed steps give a return of 2 * (1 - 0.5**k) and a discount of 0.5**k
+    batch = collector.buffer.sample_n_step(64, 3, gamma=0.5)
+    np.testing.assert_allclose(batch.reward, 2 * (1 - batch.discount))
+    collector.close()
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from milo.data.dataset import DatasetReader, DatasetWriter
+from milo.data.transition import Transition, extract_info
+
+
+@pytest.fixture
+def dataset_path(tmp_path, make_vector_transition):
+    with DatasetWriter(tmp_path / "dataset", shard_size=4) as writer:
+        for step in range(5):
+            writer.push(make_vector_transition(step))
+    return tmp_path / "dataset"
+
+
+def test_shards_and_index(dataset_path):
+    reader = DatasetReader(dataset_path)
+    assert len(reader) == 10
+    assert [shard["num_rows"] for shard in reader.shards] == [4, 4, 2]
+    assert reader.fields["obs"] == {"shape": [3], "dtype": "<f4"}
+    assert "info" not in reader.fields
+
+    shard = reader.load_shard(0)
+    np.testing.assert_array_equal(shard["env_id"], [0, 1, 0, 1])
+    np.testing.assert_array_equal(shard["reward"], [0.0, 0.0, 1.0, 1.0])
+
+
+def test_writer_errors(tmp_path, make_vector_transition):
+    writer = DatasetWriter(tmp_path / "dataset", shard_size=4)
+    writer.push(make_vector_transition(0))
+    with pytest.raises(ValueError):
+        writer.push(Transition(np.zeros((2, 3)), np.zeros((2, 1)), np.zeros(2), None, np.zeros(2)))  # type: ignore
+
+    # the pending rows are written on close, and the dataset is not overwritten
+    writer.close()
+    assert len(DatasetReader(tmp_path / "dataset")) == 2
+    with pytest.raises(ValueError):
+        writer.push(make_vector_transition(1))
+    with pytest.raises(ValueError):
+        DatasetWriter(tmp_path / "dataset")
+
+
+def test_push_subset_of_envs(tmp_path, make_vector_transition):
+    with DatasetWriter(tmp_path / "dataset") as writer:
+        writer.push(make_vector_transition(0, num_envs=3))
+        writer.push(make_vector_transition(1, num_envs=2), env_ids=np.array([0, 2]))
+
+    shard = DatasetReader(tmp_path / "dataset").load_shard(0)
+    np.testing.assert_array_equal(shard["env_id"], [0, 1, 2, 0, 2])
+
+
+@pytest.mark.parametrize("batch_size", [3, 10])
+def test_iter_batches(dataset_path, batch_size):
+    reader = DatasetReader(dataset_path)
+
+    batches = list(reader.iter_batches(batch_size))
+    # the batches span the shards, the last one holds the remaining rows
+    assert [len(batch) for batch in batches] == [batch_size] * (10 // batch_size) + [10 % batch_size] * (
+        10 % batch_size > 0
+    )
+    np.testing.assert_array_equal(np.concatenate([batch.reward for batch in batches]), np.repeat(np.arange(5), 2))
+    assert batches[0].obs.shape == (batch_size, 3)
+
+    assert [len(batch) for batch in reader.iter_batches(batch_size, drop_last=True)] == [batch_size] * (
+        10 // batch_size
+    )
+
+
+def test_iter_batches_shuffle(dataset_path):
+    reader = DatasetReader(dataset_path)
+
+    rewards = [
+        np.concatenate([batch.reward for batch in reader.iter_batches(3, shuffle=True, seed=seed)])
+        for seed in [0, 0, 1]
+    ]
+    np.testing.assert_array_equal(rewards[0], rewards[1])
+    assert not np.array_equal(rewards[0], rewards[2])
+    np.testing.assert_array_equal(np.sort(rewards[0]), np.repeat(np.arange(5), 2))
+
+
+def test_iter_batches_closed_early(dataset_path):
+    reader = DatasetReader(dataset_path)
+    batches = reader.iter_batches(1, prefetch=1)
+    next(batches)
+    # closing the generator stops the loading thread
+    batches.close()
+
+
+def test_iter_batches_loading_error(dataset_path):
+    (dataset_path / "shard_000001.npz").unlink()
+    batches = DatasetReader(dataset_path).iter_batches(4)
+    assert len(next(batches)) == 4
+    with pytest.raises(FileNotFoundError):
+        next(batches)
+
+
+def test_typed_info_is_stored(tmp_path, make_vector_transition):
+    with DatasetWriter(tmp_path / "dataset") as writer:
+        transition = make_vector_transition(0)
+        transition.info = extract_info(transition.info, {"discount": np.float32}, 2)
+        writer.push(transition)
+
+    reader = DatasetReader(tmp_path / "dataset")
+    np.testing.assert_array_equal(reader.load_shard(0)["info"]["discount"], [1.0, 1.0])
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from gymnasium.spaces import Box
+
+from milo.data.buffer.memmap import MemmapReplayBuffer
+
+
+@pytest.fixture
+def buffer(tmp_path, make_vector_transition):
+    buffer = MemmapReplayBuffer(
+        tmp_path / "buffer",
+        8,
+        observation_space=Box(-1.0, 1.0, (3,), np.float32),
+        action_space=Box(-1.0, 1.0, (1,), np.float32),
+        num_envs=2,
+        seed=0,
+    )
+    for step in range(3):
+        buffer.push(make_vector_transition(step))
+    return buffer
+
+
+def test_fields_are_mapped_files(buffer):
+    assert isinstance(buffer._data["obs"], np.memmap)
+    assert (buffer.path / "obs.npy").exists()
+    assert (buffer.path / "reward.npy").exists()
+    assert "info" not in buffer._data
+
+    batch = buffer.sample(4)
+    assert batch.obs.shape == (4, 3)
+    assert batch.info is None
+    np.testing.assert_array_equal(batch.obs[:, 0], batch.reward)
+
+
+def test_reopen_read_only(buffer, make_vector_transition):
+    buffer.flush()
+    reopened = MemmapReplayBuffer(buffer.path, mode="r")
+
+    assert len(reopened) == 6
+    assert reopened.num_envs == 2
+    np.testing.assert_array_equal(reopened.batchify().reward, buffer.batchify().reward)
+
+    with pytest.raises(ValueError):
+        reopened.push(make_vector_transition(3))
+
+
+def test_reopen_append(buffer, make_vector_transition):
+    path = buffer.path
+    buffer.flush()
+    del buffer
+
+    reopened = MemmapReplayBuffer(path, mode="r+")
+    reopened.push(make_vector_transition(3))
+    assert len(reopened) == 8
+    np.testing.assert_array_equal(reopened.sequence(1, 0, 4).reward, [0.0, 1.0, 2.0, 3.0])
+
+
+def test_sampled_rows_are_sorted(buffer):
+    batch = buffer.sample(16)
+    flat_ids = batch.env_id * buffer.env_capacity + batch.reward
+    assert np.all(np.diff(flat_ids) >= 0)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from gymnasium.spaces import Box, Discrete
+
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.buffer.pixels import PixelStorage
+from milo.data.transition import Transition
+
+
+def make_frames(values, size=(8, 8)) -> np.ndarray:
+    return np.stack([np.full((*size, 3), value, dtype=np.uint8) for value in values])
+
+
+def test_write_and_read_frames():
+    storage = PixelStorage(num_envs=2, env_capacity=10, chunk_size=4)
+    for time_id in range(6):
+        storage[np.arange(2), np.full(2, time_id)] = make_frames([time_id, 100 + time_id])
+
+    assert storage.shape == (2, 10, 8, 8, 3)
+    frames = storage[np.array([0, 1, 1]), np.array([5, 0, 4])]
+    np.testing.assert_array_equal(frames[:, 0, 0, 0], [5, 100, 104])
+    # only the written chunks are allocated
+    assert storage.nbytes == 2 * 2 * 4 * 8 * 8 * 3
+
+
+def test_frames_must_be_uint8():
+    storage = PixelStorage(num_envs=1, env_capacity=4)
+    with pytest.raises(ValueError):
+        storage[np.array([0]), np.array([0])] = np.zeros((1, 8, 8, 3), dtype=np.float32)
+
+
+def test_downscale_at_write_time():
+    storage = PixelStorage(num_envs=1, env_capacity=4, frame_size=(4, 2))
+    frame = np.arange(8 * 8 * 3, dtype=np.uint8).reshape(1, 8, 8, 3)
+    storage[np.array([0]), np.array([0])] = frame
+
+    assert storage.shape == (1, 4, 4, 2, 3)
+    np.testing.assert_array_equal(storage[0, 0], frame[0, ::2, ::4])
+
+
+def test_compress_full_chunks():
+    storage = PixelStorage(num_envs=1, env_capacity=8, chunk_size=4, compress=True)
+    for time_id in range(8):
+        storage[np.array([0]), np.array([time_id])] = make_frames([time_id], size=(32, 32))
+
+    assert all(isinstance(chunk, bytes) for chunk in storage._chunks[0])
+    assert storage.nbytes < 8 * 32 * 32 * 3 / 10
+    np.testing.assert_array_equal(storage[0, np.arange(8)][:, 0, 0, 0], np.arange(8))
+
+    # overwriting a compressed chunk decompresses it first
+    storage[np.array([0]), np.array([1])] = make_frames([42], size=(32, 32))
+    np.testing.assert_array_equal(storage[0, np.arange(4)][:, 0, 0, 0], [0, 42, 2, 3])
+
+
+def make_pixel_transition(step: int, num_envs: int = 2, reset: bool = False) -> Transition:
+    obs_values = [200 + env_id for env_id in range(num_envs)] if reset else [step] * num_envs
+    return Transition(
+        obs=make_frames(obs_values),
+        action=np.zeros(num_envs, dtype=np.int64),
+        reward=np.full(num_envs, step, dtype=np.float64),
+        next_obs=make_frames([step + 1] * num_envs),
+        done=np.zeros(num_envs, dtype=np.bool_),
+        pixels=make_frames([step + 1] * num_envs, size=(16, 16)),
+    )
+
+
+@pytest.fixture
+def buffer():
+    return ReplayBuffer(
+        8,
+        observation_space=Box(0, 255, (8, 8, 3), np.uint8),
+        action_space=Discrete(2),
+        num_envs=2,
+        pixel_storage_kwargs={"chunk_size": 2},
+        seed=0,
+    )
+
+
+def test_next_obs_is_rebuilt_from_obs(buffer):
+    for step in range(3):
+        buffer.push(make_pixel_transition(step))
+
+    assert isinstance(buffer._data["pixels"], PixelStorage)
+    # next observations are not stored a second time
+    assert buffer._data["obs"].nbytes == 2 * 2 * 2 * 8 * 8 * 3
+
+    batch = buffer.batchify()
+    np.testing.assert_array_equal(batch.obs[:, 0, 0, 0], [0, 1, 2, 0, 1, 2])
+    np.testing.assert_array_equal(batch.next_obs[:, 0, 0, 0], [1, 2, 3, 1, 2, 3])
+    np.testing.assert_array_equal(batch.pixels[:, 0, 0, 0], [1, 2, 3, 1, 2, 3])
+
+    sampled = buffer.sample(16)
+    np.testing.assert_array_equal(sampled.next_obs[:, 0, 0, 0], sampled.obs[:, 0, 0, 0] + 1)
+
+
+def test_next_obs_across_env_reset(buffer):
+    buffer.push(make_pixel_transition(0))
+    # the envs were reset, the stored obs no longer match the previous next obs
+    buffer.push(make_pixel_transition(1, reset=True))
+
+    batch = buffer.batchify()
+    np.testing.assert_array_equal(batch.obs[:, 0, 0, 0], [0, 200, 0, 201])
+    np.testing.assert_array_equal(batch.next_obs[:, 0, 0, 0], [1, 2, 1, 2])
+
+
+def test_next_obs_after_ring_wraps(buffer):
+    for step in range(7):
+        buffer.push(make_pixel_transition(step))
+
+    batch = buffer.batchify()
+    np.testing.assert_array_equal(batch.obs[:4, 0, 0, 0], [3, 4, 5, 6])
+    np.testing.assert_array_equal(batch.next_obs[:4, 0, 0, 0], [4, 5, 6, 7])
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+import torch
+from gymnasium.spaces import Box
+
+from milo.data.buffer.base import ReplayBuffer
+from milo.data.buffer.prioritized import PrioritizedReplayBuffer
+from milo.data.buffer.shared import SharedReplayBuffer
+from milo.data.prefetcher import Prefetcher
+
+
+@pytest.fixture
+def make_buffer(make_vector_transition):
+    def make(buffer_cls=ReplayBuffer, **kwargs):
+        buffer = buffer_cls(
+            16,
+            observation_space=Box(-1.0, 1.0, (3,), np.float32),
+            action_space=Box(-1.0, 1.0, (1,), np.float32),
+            num_envs=4,
+            seed=0,
+            **kwargs,
+        )
+        for step in range(3):
+            buffer.push(make_vector_transition(step, 4, reward_per_env=10.0))
+        return buffer
+
+    return make
+
+
+@pytest.fixture
+def shared_buffer(make_buffer):
+    buffer = make_buffer(SharedReplayBuffer)
+    yield buffer
+    buffer.unlink()
+
+
+def check_batch(batch, batch_size):
+    assert isinstance(batch.obs, torch.Tensor)
+    assert batch.obs.shape == (batch_size, 3)
+    # each row is a single env step
+    torch.testing.assert_close(batch.reward % 10, batch.obs[:, 0].double())
+    torch.testing.assert_close(batch.reward // 10, batch.env_id.double())
+
+
+def take_rewards(prefetcher, num_batches):
+    # the batches are overwritten once the next one is taken
+    return [next(prefetcher).reward.clone() for _ in range(num_batches)]
+
+
+@pytest.mark.parametrize("use_shared", [False, True], ids=["thread", "process"])
+def test_prefetched_batches(shared_buffer, use_shared, make_buffer):
+    buffer = shared_buffer if use_shared else make_buffer()
+    with Prefetcher(buffer, 8, depth=2, seed=3) as prefetcher:
+        assert prefetcher.use_process == use_shared
+        for _ in range(5):
+            check_batch(next(prefetcher), 8)
+    with pytest.raises(StopIteration):
+        next(prefetcher)
+
+
+@pytest.mark.parametrize("use_shared", [False, True], ids=["thread", "process"])
+def test_prefetch_is_seeded(shared_buffer, use_shared, make_buffer):
+    buffer = shared_buffer if use_shared else make_buffer()
+
+    def rewards(seed):
+        with Prefetcher(buffer, 8, depth=3, seed=seed) as prefetcher:
+            return torch.stack(take_rewards(prefetcher, 6))
+
+    torch.testing.assert_close(rewards(5), rewards(5))
+    assert not torch.equal(rewards(5), rewards(6))
+
+
+def test_prefetch_does_not_consume_buffer_generator(make_buffer):
+    buffer = make_buffer()
+    expected = make_buffer().sample(8).reward
+    with Prefetcher(buffer, 8, seed=0) as prefetcher:
+        take_rewards(prefetcher, 3)
+    np.testing.assert_array_equal(buffer.sample(8).reward, expected)
+
+
+def test_prefetch_sample_kwargs(make_buffer):
+    buffer = make_buffer(PrioritizedReplayBuffer)
+    with Prefetcher(buffer, 8, sample_kwargs={"beta": 1.0}) as prefetcher:
+        batch = next(prefetcher)
+    assert batch.indices.shape == batch.weights.shape == (8,)
+
+
+def test_prefetch_errors(shared_buffer, make_buffer):
+    with pytest.raises(ValueError):
+        Prefetcher(make_buffer(), 8, depth=0)
+    with pytest.raises(ValueError):
+        Prefetcher(make_buffer(), 8, use_process=True)
+
+    with pytest.raises(ValueError):
+        Prefetcher(ReplayBuffer(16, num_envs=4), 8)
+    shared_buffer.reset()
+    with pytest.raises(ValueError):
+        Prefetcher(shared_buffer, 8)
+
+
+def test_prefetch_errors_are_raised_when_taking_batches(make_buffer):
+    buffer = make_buffer()
+    with Prefetcher(buffer, 8, sample_kwargs={"unknown": 1}) as prefetcher:
+        # the thread has stopped, the next calls raise the same error
+        for _ in range(2):
+            with pytest.raises(TypeError):
+                next(prefetcher)
+
+
+@pytest.mark.parametrize("use_shared", [False, True], ids=["thread", "process"])
+def test_prefetch_keys(shared_buffer, use_shared, make_buffer):
+    buffer = shared_buffer if use_shared else make_buffer()
+    with Prefetcher(buffer, 8, keys=["obs", "reward", "env_id"]) as prefetcher:
+        batch = next(prefetcher)
+        assert batch.keys() == ["obs", "reward", "env_id"]
+        check_batch(batch, 8)
+        assert batch.next_obs is None
+    with pytest.raises(ValueError):
+        Prefetcher(buffer, 8, keys=["unknown"])
+
+
+def test_prefetch_samples_fields_allocated_later(make_buffer, make_vector_transition):
+    buffer = make_buffer()
+    with Prefetcher(buffer, 8, depth=1) as prefetcher:
+        assert next(prefetcher).pixels is None
+        transition = make_vector_transition(3, 4)
+        transition.pixels = np.zeros((4, 4, 4, 3), dtype=np.uint8)
+        buffer.push(transition)
+        # the fields are looked up when sampling, the batches already queued keep the old fields
+        for _ in range(3):
+            batch = next(prefetcher)
+        assert batch.pixels.shape == (8, 4, 4, 3)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from gymnasium.spaces import Box, Discrete
+
+from milo.data.buffer import PrioritizedReplayBuffer
+
+
+@pytest.fixture
+def buffer(make_vector_transition):
+    buffer = PrioritizedReplayBuffer(
+        8,
+        observation_space=Box(-np.inf, np.inf, (3,), np.float32),
+        action_space=Discrete(2),
+        num_envs=2,
+        alpha=1.0,
+        beta=1.0,
+        seed=0,
+    )
+    for step in range(4):
+        buffer.push(make_vector_transition(step, discrete=True))
+    return buffer
+
+
+def test_sample_returns_indices_and_weights(buffer):
+    batch = buffer.sample(16)
+    assert batch.indices.shape == (16,)
+    assert batch.weights.shape == (16,)
+    assert batch.weights.dtype == np.float32
+    # all rows start with the same priority
+    np.testing.assert_allclose(batch.weights, 1.0)
+    np.testing.assert_array_equal(batch.env_id, batch.indices // buffer.env_capacity)
+
+
+def test_schema_is_cached(buffer, make_vector_transition):
+    schema = buffer.schema
+    assert schema["indices"] == {"shape": [], "dtype": "<i8"}
+    assert buffer.schema is schema
+
+    # a new field rebuilds the schema
+    transition = make_vector_transition(4, discrete=True)
+    transition.pixels = np.zeros((2, 4, 4, 3), dtype=np.uint8)
+    buffer.push(transition)
+    assert {"pixels", "indices", "weights"} <= buffer.schema.keys()
+
+
+def test_update_priorities_biases_sampling(buffer):
+    buffer.update_priorities(np.arange(8), np.full(8, 1e-3))
+    buffer.update_priorities(np.array([5]), np.array([100.0]))
+
+    batch = buffer.sample(64)
+    assert np.mean(batch.indices == 5) > 0.9
+    assert batch.reward[batch.indices == 5][0] == 1.0
+    # the over-sampled row gets the smallest importance weight
+    assert batch.weights[batch.indices == 5][0] == batch.weights.min()
+
+
+def test_new_rows_get_max_priority(buffer, make_vector_transition):
+    buffer.update_priorities(np.array([0]), np.array([10.0]))
+    buffer.reset()
+    assert buffer._sum_tree.reduce() == 0.0
+
+    buffer.push(make_vector_transition(0, discrete=True))
+    assert buffer._sum_tree.reduce() == 2.0
+
+
+def test_update_priorities_rejects_non_positive(buffer):
+    with pytest.raises(AssertionError):
+        buffer.update_priorities(np.array([0]), np.array([0.0]))
@@ -0,0 +1,39 @@
+import numpy as np
+
+from milo.data.buffer.segment_tree import MinTree, SumTree
+
+
+def test_sum_tree_update_and_reduce():
+    tree = SumTree(5)
+    tree.update(np.arange(5), np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
+    assert tree.reduce() == 15.0
+
+    tree.update(np.array([1, 3]), np.array([0.0, 10.0]))
+    assert tree.reduce() == 19.0
+    np.testing.assert_array_equal(tree[np.arange(5)], [1.0, 0.0, 3.0, 10.0, 5.0])
+
+
+def test_sum_tree_find_prefix_sum_index():
+    tree = SumTree(4)
+    tree.update(np.arange(4), np.array([1.0, 0.0, 2.0, 1.0]))
+
+    indices = tree.find_prefix_sum_index(np.array([0.0, 0.5, 1.0, 2.9, 3.0, 3.99]))
+    np.testing.assert_array_equal(indices, [0, 0, 2, 2, 3, 3])
+
+
+def test_sum_tree_single_leaf():
+    tree = SumTree(1)
+    tree.update(np.array([0]), 2.0)
+    assert tree.reduce() == 2.0
+    np.testing.assert_array_equal(tree.find_prefix_sum_index(np.array([1.5])), [0])
+
+
+def test_min_tree():
+    tree = MinTree(6)
+    assert tree.reduce() == np.inf
+
+    tree.update(np.array([0, 4]), np.array([3.0, 2.0]))
+    assert tree.reduce() == 2.0
+
+    tree.clear()
+    assert tree.reduce() == np.inf
@@ -0,0 +1,66 @@
+import multiprocessing
+from collections.abc import Callable
+
+import numpy as np
+import pytest
+from gymnasium.spaces import Box
+
+from milo.data.buffer.shared import SharedReplayBuffer
+from milo.data.transition import Transition
+
+
+def collect(buffer: SharedReplayBuffer, num_steps: int, make_vector_transition: Callable[..., Transition]) -> None:
+    for step in range(num_steps):
+        buffer.push(make_vector_transition(step, len(buffer.env_ids)))
+    buffer.close()
+
+
+@pytest.fixture
+def buffer():
+    buffer = SharedReplayBuffer(
+        16,
+        observation_space=Box(-1.0, 1.0, (3,), np.float32),
+        action_space=Box(-1.0, 1.0, (1,), np.float32),
+        num_envs=4,
+        seed=0,
+    )
+    yield buffer
+    buffer.unlink()
+
+
+def test_attach_shares_memory(buffer, make_vector_transition):
+    attached = SharedReplayBuffer.attach(buffer.handle)
+    attached.push(make_vector_transition(7, 4))
+
+    assert len(buffer) == 4
+    np.testing.assert_array_equal(buffer.sample(8).reward, 7.0)
+    attached.close()
+
+
+def test_undeclared_field_raises(buffer, make_vector_transition):
+    transition = make_vector_transition(0, 4)
+    transition.pixels = np.zeros((4, 2, 2, 3), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        buffer.push(transition)
+
+
+def test_collector_processes_write_concurrently(buffer, make_vector_transition):
+    # each writer process owns two of the four envs
+    writers = [
+        SharedReplayBuffer.attach(buffer.handle, env_ids=np.array([0, 1])),
+        SharedReplayBuffer.attach(buffer.handle, env_ids=np.array([2, 3])),
+    ]
+    processes = [
+        multiprocessing.Process(target=collect, args=(writer, 3, make_vector_transition)) for writer in writers
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    for writer in writers:
+        writer.close()
+
+    assert len(buffer) == 12
+    np.testing.assert_array_equal(buffer._size, [3, 3, 3, 3])
+    np.testing.assert_array_equal(buffer.batchify().reward, np.tile([0.0, 1.0, 2.0], 4))
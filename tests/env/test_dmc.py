@@ -53,6 +53,15 @@ def test_render_size(dmc_env):
     assert render_frame.shape == (100, 200, 3)
 
 
+def test_render_camera_zero():
+    env = DMC2Gym(domain="cartpole", task="swingup", render_height=32, render_width=32, render_camera_id=1)
+    env.reset(seed=0)
+    # an explicit camera 0 is not replaced by the default camera
+    assert not np.array_equal(env.render(camera_id=0), env.render())
+    np.testing.assert_array_equal(env.render(camera_id=1), env.render())
+    env.close()
+
+
 def test_getattr(dmc_env):
     assert hasattr(dmc_env, "reset")
     assert hasattr(dmc_env, "step")
@@ -98,3 +107,59 @@ def test_seed_task_kwargs_observation_space():
 
     assert not np.array_equal(obs_13, obs_99)
     assert np.array_equal(obs_13, obs_13_bis)
+
+
+def test_flat_observation_layout(dmc_env):
+    observation, _ = dmc_env.reset(seed=3)
+    timestep_observation = dmc_env._env.task.get_observation(dmc_env._env.physics)
+    expected = np.concatenate([np.asarray(value, dtype=np.float32).ravel() for value in timestep_observation.values()])
+    np.testing.assert_array_equal(observation, expected)
+    assert observation.dtype == np.float32
+    assert dmc_env.observation_space.contains(observation)
+
+
+def test_copy_obs():
+    env = DMC2Gym(domain="cartpole", task="swingup", copy_obs=False)
+    observation, _ = env.reset(seed=3)
+    next_observation, *_ = env.step(np.zeros(env.action_space.shape, dtype=np.float32))
+    # the same buffer is reused at every step
+    assert next_observation is observation
+
+    env = DMC2Gym(domain="cartpole", task="swingup")
+    observation, _ = env.reset(seed=3)
+    next_observation, *_ = env.step(np.zeros(env.action_space.shape, dtype=np.float32))
+    assert not np.array_equal(observation, next_observation)
+
+
+def test_dict_observations():
+    flat_env = DMC2Gym(domain="cartpole", task="swingup")
+    env = DMC2Gym(domain="cartpole", task="swingup", flatten_obs=False)
+    assert set(env.observation_space.keys()) == {"position", "velocity"}
+
+    observation, _ = env.reset(seed=3)
+    flat_observation, _ = flat_env.reset(seed=3)
+    assert env.observation_space.contains(observation)
+    np.testing.assert_array_equal(np.concatenate(list(observation.values())), flat_observation)
+
+
+def test_action_check_clip():
+    env = DMC2Gym(domain="walker", task="run", action_check="clip")
+    reference = DMC2Gym(domain="walker", task="run")
+    env.reset(seed=5)
+    reference.reset(seed=5)
+
+    action = np.ones(env.action_space.shape) * 10
+    observation, *_ = env.step(action)
+    reference_observation, *_ = reference.step(np.ones(env.action_space.shape, dtype=np.float32))
+    np.testing.assert_array_equal(observation, reference_observation)
+    # the caller's action is left untouched
+    np.testing.assert_array_equal(action, 10)
+
+
+def test_action_check_off():
+    env = DMC2Gym(domain="walker", task="run", action_check="off")
+    env.reset()
+    env.step(np.ones(env.action_space.shape) * 10)
+
+    with pytest.raises(ValueError):
+        DMC2Gym(domain="walker", task="run", action_check="invalid")
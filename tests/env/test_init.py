@@ -1,10 +1,20 @@
 import copy
+import importlib.metadata
+import json
+import subprocess
+import sys
 
 import gymnasium as gym
 import numpy as np
 import pytest
 
-from milo.env import find_simulator, make_env
+from milo.env import (
+    ENV_ID_CACHE_VARIABLE,
+    _known_env_ids,
+    find_simulator,
+    make_env,
+    make_multi_task_env,
+)
 
 
 def test_find_simulator():
@@ -118,3 +128,100 @@ class TestMakeEnv:
 
         with pytest.raises(ValueError):
             make_env(env_id, simulator=simulator)
+
+
+def test_make_env_action_repeat():
+    env = make_env("CartPole-v1", num_envs=2, vectorization_mode="async", action_repeat=3)
+    env.reset(seed=13)
+    _, rewards, *_ = env.step(np.zeros(2, dtype=np.int64))
+    np.testing.assert_array_equal(rewards, [3.0, 3.0])
+    env.close()
+
+    with pytest.raises(ValueError):
+        make_env("CartPole-v1", action_repeat=0)
+
+
+def test_find_simulator_gymnasium_imports():
+    # a gymnasium id never imports the mujoco based simulators
+    code = (
+        "import sys; from milo.env import find_simulator; "
+        "assert find_simulator('CartPole-v1') == 'gymnasium'; "
+        "assert find_simulator('Unsupported-v0') is None; "
+        "assert not {'mujoco', 'dm_control', 'metaworld'} & set(sys.modules)"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_find_simulator_cache(tmp_path, monkeypatch):
+    pytest.importorskip("dm_control")
+    cache_path = tmp_path / "env_ids.json"
+    monkeypatch.setenv(ENV_ID_CACHE_VARIABLE, str(cache_path))
+    _known_env_ids.cache_clear()
+    assert find_simulator("walker-walk") == "dmc"
+    cache = json.loads(cache_path.read_text())
+    assert "walker-walk" in cache["dmc"]["env_ids"]
+
+    # the ids are read back from the cache without importing dm_control
+    cache["dmc"]["env_ids"] = ["walker-cached"]
+    cache_path.write_text(json.dumps(cache))
+    _known_env_ids.cache_clear()
+    assert find_simulator("walker-cached") == "dmc"
+    assert find_simulator("walker-walk") is None
+    _known_env_ids.cache_clear()
+
+
+def test_find_simulator_corrupted_cache(tmp_path, monkeypatch):
+    pytest.importorskip("dm_control")
+    cache_path = tmp_path / "env_ids.json"
+    cache_path.write_text('{"dmc": {"version": ')
+    monkeypatch.setenv(ENV_ID_CACHE_VARIABLE, str(cache_path))
+    _known_env_ids.cache_clear()
+
+    # a truncated cache is a cache miss and is rewritten
+    assert find_simulator("walker-walk") == "dmc"
+    assert "walker-walk" in json.loads(cache_path.read_text())["dmc"]["env_ids"]
+    assert list(tmp_path.iterdir()) == [cache_path]
+    _known_env_ids.cache_clear()
+
+
+def test_find_simulator_without_metadata(tmp_path, monkeypatch):
+    pytest.importorskip("dm_control")
+
+    def missing_version(name):
+        raise importlib.metadata.PackageNotFoundError(name)
+
+    cache_path = tmp_path / "env_ids.json"
+    monkeypatch.setenv(ENV_ID_CACHE_VARIABLE, str(cache_path))
+    monkeypatch.setattr(importlib.metadata, "version", missing_version)
+    _known_env_ids.cache_clear()
+
+    # an importable simulator without package metadata is found, without caching its ids
+    assert find_simulator("walker-walk") == "dmc"
+    assert not cache_path.exists()
+    _known_env_ids.cache_clear()
+
+
+@pytest.mark.parametrize("vectorization_mode", ["sync", "async"])
+def test_make_multi_task_env(vectorization_mode):
+    env_ids = [("Pendulum-v1", 2), ("MountainCarContinuous-v0", 1), ("cartpole-swingup", 1)]
+    env = make_multi_task_env(env_ids, vectorization_mode=vectorization_mode)
+    assert env.num_envs == 4
+    # cartpole has the largest observations
+    assert env.single_observation_space.shape == (5,)
+    assert env.single_action_space.shape == (1,)
+
+    obs, info = env.reset(seed=13)
+    np.testing.assert_array_equal(info["task_id"], [0, 0, 1, 2])
+    np.testing.assert_array_equal(obs[2, 2:], 0.0)
+
+    obs, _, _, _, info = env.step(env.action_space.sample())
+    assert obs.shape == (4, 5)
+    np.testing.assert_array_equal(info["task_id"], [0, 0, 1, 2])
+    env.close()
+
+
+def test_make_multi_task_env_errors():
+    with pytest.raises(ValueError):
+        make_multi_task_env([("Pendulum-v1", 1), ("CartPole-v1", 1)])
+    with pytest.raises(ValueError):
+        make_multi_task_env([("Pendulum-v1", 0)])
@@ -0,0 +1,41 @@
+import pickle
+import random
+
+import pytest
+
+metaworld = pytest.importorskip("metaworld")
+
+from milo.env.metaworld import get_benchmark, make, sample_tasks
+
+
+def test_benchmark_is_cached():
+    assert get_benchmark("button-press-topdown-v2", seed=1) is get_benchmark("button-press-topdown-v2", seed=1)
+
+
+def test_sample_tasks_ml1():
+    tasks = sample_tasks("button-press-topdown-v2", 3, seed=1)
+    assert len({pickle.dumps(task) for _, task in tasks}) == 3
+    assert all(task.env_name == "button-press-topdown-v2" for _, task in tasks)
+
+
+def test_sample_tasks_follow_global_seed():
+    def sampled():
+        random.seed(3)
+        return [pickle.dumps(task) for _, task in sample_tasks("button-press-topdown-v2", 3)]
+
+    assert sampled() == sampled()
+
+
+def test_sample_tasks_multi_task():
+    tasks = sample_tasks("MT10", 12, seed=1)
+    env_names = [task.env_name for _, task in tasks]
+    # every env name of the benchmark is used
+    assert len(set(env_names)) == 10
+    assert all(env_cls is get_benchmark("MT10", 1).train_classes[task.env_name] for env_cls, task in tasks)
+
+
+def test_make_multi_task():
+    env = make("MT10", num_envs=2, vectorization_mode="sync", env_spec_kwargs={"benchmark_seed": 1})
+    obs, _ = env.reset(seed=13)
+    assert obs.shape == env.observation_space.shape
+    env.close()
@@ -0,0 +1,134 @@
+import os
+import time
+
+import gymnasium as gym
+import numpy as np
+import pytest
+from gymnasium.error import AlreadyPendingCallError, NoAsyncCallError
+
+from milo.env.utils import AsyncVectorEnv, SyncVectorEnv
+
+
+@pytest.fixture(params=[True, False], ids=["shared_memory", "pipes"])
+def async_env(request):
+    env = AsyncVectorEnv([lambda: gym.make("CartPole-v1")] * 4, shared_memory=request.param)
+    yield env
+    env.close()
+
+
+def test_step_ids_matches_step(async_env):
+    reference = gym.vector.SyncVectorEnv([lambda: gym.make("CartPole-v1")] * 4)
+    obs, _ = async_env.reset(seed=7)
+    reference.reset(seed=7)
+    actions = np.array([0, 1, 1, 0])
+
+    # the two groups are in flight at the same time
+    async_env.step_async_ids(actions[[2, 3]], [2, 3])
+    async_env.step_async_ids(actions[[0, 1]], [0, 1])
+    obs_a, rewards_a, terminated_a, _, _ = async_env.step_wait_ids([2, 3])
+    obs_b, rewards_b, _, truncated_b, _ = async_env.step_wait_ids([0, 1])
+    expected_obs, expected_rewards, *_ = reference.step(actions)
+
+    np.testing.assert_allclose(np.concatenate([obs_b, obs_a]), expected_obs)
+    np.testing.assert_array_equal(np.concatenate([rewards_b, rewards_a]), expected_rewards)
+    assert terminated_a.shape == truncated_b.shape == (2,)
+    reference.close()
+
+    # all the envs are idle again
+    assert async_env.step(actions)[0].shape == (4, 4)
+
+
+def test_step_ids_info(async_env):
+    async_env.reset(seed=7)
+    async_env.step_async_ids(np.zeros(2, dtype=np.int64), [1, 3])
+    *_, info = async_env.step_wait_ids([1, 3])
+    assert all(len(value) == 2 for value in info.values())
+
+
+def test_step_ids_errors(async_env):
+    async_env.reset(seed=7)
+    with pytest.raises(NoAsyncCallError):
+        async_env.step_wait_ids([0])
+
+    async_env.step_async_ids(np.zeros(1, dtype=np.int64), [0])
+    with pytest.raises(AlreadyPendingCallError):
+        async_env.step_async_ids(np.zeros(1, dtype=np.int64), [0])
+    with pytest.raises(AlreadyPendingCallError):
+        async_env.step(np.zeros(4, dtype=np.int64))
+    # the envs not stepped by id would never answer a `step_wait`
+    with pytest.raises(NoAsyncCallError):
+        async_env.step_wait(timeout=1)
+    async_env.step_wait_ids([0])
+
+    # the envs stepped by `step_async` cannot be stepped again by id
+    async_env.step_async(np.zeros(4, dtype=np.int64))
+    with pytest.raises(AlreadyPendingCallError):
+        async_env.step_async_ids(np.zeros(1, dtype=np.int64), [0])
+    async_env.step_wait()
+
+
+def test_close_while_stepping(async_env):
+    async_env.reset(seed=7)
+    async_env.step_async_ids(np.zeros(2, dtype=np.int64), [0, 1])
+    async_env.close()
+    assert async_env.closed
+
+
+class SleepEnv(gym.Env):
+    """Env whose steps take `delay` seconds."""
+
+    observation_space = gym.spaces.Box(-1.0, 1.0, (1,), np.float32)
+    action_space = gym.spaces.Discrete(2)
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._pid = os.getpid()
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        return np.zeros(1, dtype=np.float32), {}
+
+    def step(self, action):
+        time.sleep(self.delay)
+        return np.full(1, self.delay, dtype=np.float32), 1.0, False, False, {}
+
+
+def test_step_wait_ready():
+    env = AsyncVectorEnv([lambda: SleepEnv(0.5), lambda: SleepEnv(0.0), lambda: SleepEnv(0.0)])
+    env.reset(seed=7)
+    env.step_async_ids(np.zeros(3, dtype=np.int64), [0, 1, 2])
+
+    env_ids, (obs, rewards, *_) = env.step_wait_ready(2)
+    np.testing.assert_array_equal(env_ids, [1, 2])
+    np.testing.assert_array_equal(obs, [[0.0], [0.0]])
+    assert rewards.shape == (2,)
+
+    # only the slow env is left
+    env_ids, (obs, *_) = env.step_wait_ready(2)
+    np.testing.assert_array_equal(env_ids, [0])
+    np.testing.assert_array_equal(obs, [[0.5]])
+    with pytest.raises(NoAsyncCallError):
+        env.step_wait_ready(1)
+    env.close()
+
+
+@pytest.mark.parametrize("vector_env", [AsyncVectorEnv, SyncVectorEnv])
+def test_reconfigure_ids(vector_env):
+    env = vector_env([lambda: SleepEnv(0.0)] * 2)
+    pid = env.call("_pid") if vector_env is AsyncVectorEnv else None
+    env.reset(seed=7)
+
+    env.reconfigure_ids([lambda: SleepEnv(0.25)], env_ids=[1])
+    env.reset(seed=7)
+    obs, *_ = env.step(np.zeros(2, dtype=np.int64))
+    np.testing.assert_array_equal(obs, [[0.0], [0.25]])
+    if vector_env is AsyncVectorEnv:
+        # the same worker processes are used
+        assert env.call("_pid") == pid
+
+    # an env that cannot be batched with the others is not swapped in
+    with pytest.raises(ValueError):
+        env.reconfigure_ids([lambda: gym.make("CartPole-v1")], env_ids=[0])
+    obs, *_ = env.step(np.zeros(2, dtype=np.int64))
+    np.testing.assert_array_equal(obs, [[0.0], [0.25]])
+    env.close()
@@ -0,0 +1,128 @@
+import gymnasium as gym
+import numpy as np
+import pytest
+
+from milo.env.utils import AsyncVectorEnv
+from milo.env.wrappers import ActionRepeat, PadTask, RenderInfo, common_padded_spaces
+
+
+class CameraEnv(gym.Env):
+    """Env rendering its step counter, with the render arguments of `DMC2Gym`."""
+
+    observation_space = gym.spaces.Box(-1.0, 1.0, (1,), np.float32)
+    action_space = gym.spaces.Discrete(2)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self._step = 0
+        return np.zeros(1, dtype=np.float32), {}
+
+    def step(self, action):
+        self._step += 1
+        return np.zeros(1, dtype=np.float32), 0.0, False, False, {}
+
+    def render(self, height=8, width=8, camera_id=0):
+        return np.full((height, width, 3), 10 * camera_id + self._step, dtype=np.uint8)
+
+
+class FixedSizeEnv(CameraEnv):
+    def render(self):
+        return np.arange(8 * 6 * 3, dtype=np.uint8).reshape(8, 6, 3)
+
+
+def test_render_info_kwargs():
+    env = RenderInfo(CameraEnv(), frame_size=(4, 5), camera_id=2)
+    _, info = env.reset(seed=0)
+    assert info["pixels"].shape == (4, 5, 3)
+    assert info["pixels"][0, 0, 0] == 20
+
+    *_, info = env.step(0)
+    assert info["pixels"][0, 0, 0] == 21
+
+
+def test_render_info_resize():
+    env = RenderInfo(FixedSizeEnv(), frame_size=(4, 3))
+    env.reset(seed=0)
+    *_, info = env.step(0)
+    frame = FixedSizeEnv().render()
+    np.testing.assert_array_equal(info["pixels"], frame[::2, ::2])
+
+    with pytest.raises(ValueError):
+        RenderInfo(FixedSizeEnv(), camera_id=1)
+
+
+def test_render_info_vector_env():
+    env = AsyncVectorEnv([lambda: RenderInfo(CameraEnv(), frame_size=(4, 4))] * 2)
+    env.reset(seed=0)
+    *_, info = env.step(np.zeros(2, dtype=np.int64))
+    # the frames come back stacked with the step results
+    assert info["pixels"].shape == (2, 4, 4, 3)
+    np.testing.assert_array_equal(info["pixels"][:, 0, 0, 0], [1, 1])
+    env.close()
+
+
+class CountEnv(CameraEnv):
+    """Env rewarding its step counter and terminating after 5 steps."""
+
+    def step(self, action):
+        self._step += 1
+        return np.full(1, self._step, dtype=np.float32), float(self._step), self._step >= 5, False, {}
+
+
+def test_action_repeat():
+    env = ActionRepeat(CountEnv(), repeat=3)
+    env.reset(seed=0)
+    obs, reward, terminated, _, _ = env.step(0)
+    assert obs[0] == 3 and reward == 1 + 2 + 3 and not terminated
+
+    # the repeat stops at the end of the episode
+    obs, reward, terminated, _, _ = env.step(0)
+    assert obs[0] == 5 and reward == 4 + 5 and terminated
+
+    with pytest.raises(ValueError):
+        ActionRepeat(CountEnv(), repeat=0)
+
+
+class BoxEnv(gym.Env):
+    """Env echoing its action in the first entries of its observation."""
+
+    observation_space = gym.spaces.Box(-1.0, 1.0, (2, 2), np.float64)
+    action_space = gym.spaces.Box(-2.0, 2.0, (2,), np.float32)
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        return np.ones((2, 2)), {}
+
+    def step(self, action):
+        assert action.shape == (2,)
+        obs = np.zeros((2, 2))
+        obs[0] = action
+        return obs, 0.0, False, False, {}
+
+
+def test_pad_task():
+    observation_space, action_space = common_padded_spaces(
+        [
+            (BoxEnv.observation_space, BoxEnv.action_space),
+            (gym.spaces.Box(-3.0, 3.0, (6,)), gym.spaces.Box(-1.0, 1.0, (3,))),
+        ],
+    )
+    np.testing.assert_array_equal(observation_space.low, [-3.0] * 6)
+    np.testing.assert_array_equal(action_space.low, [-2.0, -2.0, -1.0])
+
+    env = PadTask(BoxEnv(), observation_space, action_space, task_id=4)
+    obs, info = env.reset(seed=0)
+    np.testing.assert_array_equal(obs, [1, 1, 1, 1, 0, 0])
+    assert info["task_id"] == 4
+
+    # the padded action entries are ignored, the others clipped to the bounds of the env
+    obs, *_, info = env.step(np.array([0.5, -3.0, 1.0], dtype=np.float32))
+    np.testing.assert_array_equal(obs, [0.5, -2.0, 0, 0, 0, 0])
+    assert obs.dtype == np.float32
+    assert info["task_id"] == 4
+
+    small_observation_space = gym.spaces.Box(-1.0, 1.0, (3,))
+    with pytest.raises(ValueError):
+        PadTask(BoxEnv(), small_observation_space, action_space, task_id=0)
+    with pytest.raises(ValueError):
+        PadTask(CameraEnv(), observation_space, action_space, task_id=0)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import torch
+from gymnasium.spaces import Box, Discrete
+from torch import nn
+
+from milo.data.collector import Collector
+from milo.env import make_env
+from milo.policy import BasePolicy
+
+
+class LinearPolicy(BasePolicy):
+    def __init__(self, obs_dim, action_space, **kwargs):
+        super().__init__(action_space, **kwargs)
+        self.linear = nn.Linear(obs_dim, action_space.shape[0])
+        self.calls = 0
+
+    def forward(self, obs):
+        self.calls += 1
+        return torch.tanh(self.linear(obs)) * 2.0
+
+
+@pytest.fixture
+def env():
+    env = make_env("Pendulum-v1", num_envs=3, vectorization_mode="sync")
+    yield env
+    env.close()
+
+
+def test_collect_with_policy(env):
+    policy = LinearPolicy(3, env.single_action_space)
+    collector = Collector(policy, env)
+    collector.reset(seed=13)
+    collector.collect(n_step=5)
+
+    # one batched forward pass per vector step
+    assert policy.calls == 5
+    # the rows are ordered by env, the expected actions are computed one vector step at a time
+    batch = collector.buffer.batchify()
+    obs = batch.obs.reshape(3, 5, -1)
+    actions = batch.action.reshape(3, 5, -1)
+    with torch.no_grad():
+        for step in range(5):
+            expected = policy(torch.from_numpy(obs[:, step])).numpy()
+            np.testing.assert_allclose(actions[:, step], expected, rtol=1e-6, atol=1e-6)
+
+
+def test_collect_inference_mode(env):
+    class CheckPolicy(LinearPolicy):
+        def forward(self, obs):
+            assert torch.is_inference_mode_enabled()
+            return super().forward(obs)
+
+    collector = Collector(CheckPolicy(3, env.single_action_space), env)
+    collector.reset(seed=13)
+    collector.collect(n_step=2)
+
+
+def test_collect_random_ignores_policy(env):
+    policy = LinearPolicy(3, env.single_action_space)
+    collector = Collector(policy, env)
+    collector.reset(seed=13)
+    collector.collect(n_step=2, random=True)
+    assert policy.calls == 0
+
+
+def test_exploration_noise_box():
+    space = Box(-1.0, 1.0, (2,), np.float32)
+    policy = LinearPolicy(3, space, noise_std=10.0, seed=0)
+    actions = np.zeros((64, 2), dtype=np.float32)
+
+    noisy = policy.exploration_noise(actions)
+    assert noisy is actions
+    assert noisy.dtype == np.float32
+    assert np.all(noisy >= -1.0) and np.all(noisy <= 1.0)
+    assert np.any(noisy != 0.0)
+
+
+def test_exploration_noise_discrete():
+    class ArgmaxPolicy(BasePolicy):
+        def forward(self, obs):
+            return torch.zeros(len(obs), dtype=torch.int64)
+
+    policy = ArgmaxPolicy(Discrete(4), epsilon=0.5, seed=0)
+    noisy = policy.exploration_noise(np.zeros(1000, dtype=np.int64))
+    assert set(np.unique(noisy)) <= {0, 1, 2, 3}
+    assert 0.2 < np.mean(noisy != 0) < 0.5
+
+    policy.epsilon = 0.0
+    np.testing.assert_array_equal(policy.exploration_noise(np.zeros(10, dtype=np.int64)), 0)